@@ -0,0 +1,208 @@
+'''
+Runs a grid of headless, turbo-mode episodes across a process pool and
+appends one row per episode to a CSV results file.
+
+The grid is every combination of the given layouts, car counts, parked
+settings and seeds. Each episode runs in a fresh worker process (the
+simulator keeps its settings in the global Const class). Rows are written
+as soon as an episode finishes, so an interrupted batch can be resumed by
+running the same command again: episodes that already have a successful
+row in the results file are skipped, and episodes that failed are run
+again (their error rows stay in the file).
+
+Every episode is capped at --maxSimTime simulated seconds, and at --timeout
+seconds of wall-clock time in case a worker hangs; an episode that hits the
+wall-clock limit gets an error row. The cap is recorded in every row, so
+rerunning with another --maxSimTime runs the episodes again.
+
+Example:
+    python batchRunner.py -l small,lombard -k 1,3 -p moving,parked -n 10 -j -m
+'''
+from engine.const import Const
+
+import contextlib
+import csv
+import io
+import multiprocessing
+import optparse
+import os
+import random
+import time
+import traceback
+
+
+KEY_COLUMNS = ['layout', 'numCars', 'parked', 'seed', 'intelligent', 'planner', 'inference', 'maxSimTime']
+RESULT_COLUMNS = ['status', 'victory', 'collided', 'timedOut', 'checkpoints', 'ticks',
+                  'simTime', 'wallTime', 'meanError',
+                  'inferTime', 'actionTime', 'updateTime', 'drawTime', 'uiTime',
+                  'tickP50', 'tickP95', 'tickP99', 'missedDeadlines']
+COLUMNS = KEY_COLUMNS + RESULT_COLUMNS
+
+NUM_CHECKPTS = {'m_small': 2, 'm_val': 2, 'm_lombard': 3, 'm_large': 4}
+
+
+def getKey(episode):
+    return tuple(str(episode[column]) for column in KEY_COLUMNS)
+
+
+# Function: Run Episode
+# ---------------------
+# Runs one episode in the current process, for at most its maxSimTime
+# simulated seconds, and returns its result row. Exceptions are reported in
+# the row instead of stopping the batch.
+def runEpisode(episode):
+    row = dict(episode)
+    row['status'] = 'ok'
+    try:
+        Const.WORLD = episode['layout']
+        Const.MULTIPLE_GOALS = episode['layout'].startswith('m_')
+        Const.NUM_CHECKPTS = NUM_CHECKPTS.get(episode['layout'], Const.NUM_CHECKPTS)
+        Const.NUM_AGENTS = episode['numCars']
+        Const.CARS_PARKED = episode['parked']
+        Const.SHOW_CARS = False
+        Const.INFERENCE = episode['inference']
+        Const.AUTO = True
+        Const.INTELLIGENT_DRIVER = episode['intelligent']
+        Const.PLANNER = episode['planner']
+        Const.HEADLESS = True
+        Const.TURBO = True
+        Const.TIME_OUT = episode['maxSimTime']
+        Const.TURBO_TIME_OUT = episode['maxSimTime']
+        Const.SEED = episode['seed']
+        random.seed(episode['seed'])
+
+        from engine.controller import Controller
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            controller = Controller()
+            controller.drive()
+        wallTime = time.time() - start
+
+        userThread = controller.userThread
+        errorCounter = controller.errorCounter
+        phaseTimes = controller.getPhaseTimes()
+        row['victory'] = userThread.victory
+        row['collided'] = userThread.hasCollided()
+        row['timedOut'] = controller.timedOut
+        row['checkpoints'] = controller.model.nextCheckPtIdx
+        row['ticks'] = controller.iteration
+        row['simTime'] = round(controller.getSimTime(), 3)
+        row['wallTime'] = round(wallTime, 3)
+        row['meanError'] = errorCounter.getMean() if errorCounter.count else ''
+        for phase in ['infer', 'action', 'update', 'draw', 'ui']:
+            row[phase + 'Time'] = round(phaseTimes[phase], 4)
+        tickStats = controller.getTickStats()
+        for p in [50, 95, 99]:
+            row['tickP%d' % p] = round(tickStats.getPercentile(p), 4)
+        row['missedDeadlines'] = controller.missedDeadlines.getTotal()
+    except Exception:
+        row['status'] = 'error: ' + traceback.format_exc().strip().split('\n')[-1]
+    return row
+
+
+# Keys of the episodes with a successful row in the results file. A file
+# written with other columns (e.g. before maxSimTime was recorded) cannot
+# be resumed, since its rows would not line up with the new ones.
+def readDone(resultsPath):
+    if not os.path.exists(resultsPath) or os.path.getsize(resultsPath) == 0: return set()
+    with open(resultsPath, newline='') as resultsFile:
+        reader = csv.DictReader(resultsFile)
+        if reader.fieldnames != COLUMNS:
+            raise SystemExit('%s has different columns, write the results to a new file' % resultsPath)
+        return set(getKey(row) for row in reader if row['status'] == 'ok')
+
+
+def getTimeoutRow(episode, timeout):
+    row = dict(episode)
+    row['status'] = 'error: no result after %g seconds of wall-clock time' % timeout
+    return row
+
+
+def parseList(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+if __name__ == '__main__':
+
+    parser = optparse.OptionParser()
+    parser.add_option('-l', '--layouts', dest='layouts', default='small')
+    parser.add_option('-k', '--numCars', dest='numCars', default='3')
+    parser.add_option('-p', '--parked', dest='parked', default='moving',
+                      help='comma separated list of moving and/or parked')
+    parser.add_option('-n', '--numSeeds', type='int', dest='numSeeds', default=10)
+    parser.add_option('--seed', type='int', dest='seed', default=0, help='first seed')
+    parser.add_option('-m', '--checkpoints', dest='checkpoints', default=False, action='store_true')
+    parser.add_option('-j', '--intelligentDriver', dest='intelligentDriver', default=False, action='store_true')
+    parser.add_option('-t', '--planner', dest='planner', default='dijkstra')
+    parser.add_option('-i', '--inference', dest='inference', default='estimator')
+    parser.add_option('-w', '--workers', type='int', dest='workers', default=multiprocessing.cpu_count())
+    parser.add_option('-o', '--output', dest='output', default='results.csv')
+    parser.add_option('--maxSimTime', type='float', dest='maxSimTime', default=Const.TURBO_TIME_OUT,
+                      help='simulated seconds before an episode times out')
+    parser.add_option('--timeout', type='float', dest='timeout', default=3600.0,
+                      help='wall-clock seconds to wait for an episode before giving up on it')
+
+    (options, _) = parser.parse_args()
+    if options.planner not in Const.PLANNER_TYPES:
+        parser.error('planner must be one of ' + ', '.join(Const.PLANNER_TYPES))
+    if options.maxSimTime <= 0 or options.timeout <= 0:
+        parser.error('maxSimTime and timeout must be positive')
+    for setting in parseList(options.parked):
+        if setting not in ['moving', 'parked']:
+            parser.error('parked must list moving and/or parked')
+
+    layouts = parseList(options.layouts)
+    if options.checkpoints:
+        layouts = ['m_' + layout for layout in layouts]
+    episodes = []
+    for layout in layouts:
+        for numCars in parseList(options.numCars, int):
+            for parked in parseList(options.parked):
+                for seed in range(options.seed, options.seed + options.numSeeds):
+                    episodes.append({
+                        'layout': layout,
+                        'numCars': numCars,
+                        'parked': parked == 'parked',
+                        'seed': seed,
+                        'intelligent': options.intelligentDriver,
+                        'planner': options.planner,
+                        'inference': options.inference,
+                        'maxSimTime': options.maxSimTime,
+                    })
+
+    done = readDone(options.output)
+    todo = [episode for episode in episodes if getKey(episode) not in done]
+    print('%d episodes, %d already in %s, running %d' % (
+        len(episodes), len(episodes) - len(todo), options.output, len(todo)))
+    if not todo: raise SystemExit(0)
+
+    writeHeader = not os.path.exists(options.output) or os.path.getsize(options.output) == 0
+    pool = multiprocessing.Pool(processes=options.workers, maxtasksperchild=1)
+    results = [pool.apply_async(runEpisode, (episode,)) for episode in todo]
+    hung = False
+    with open(options.output, 'a', newline='') as resultsFile:
+        writer = csv.DictWriter(resultsFile, fieldnames=COLUMNS)
+        if writeHeader:
+            writer.writeheader()
+        # Results are collected in submission order, which is also the
+        # order the pool starts episodes in, so each wait of --timeout
+        # seconds roughly covers one episode's run.
+        for i, (episode, result) in enumerate(zip(todo, results)):
+            try:
+                row = result.get(options.timeout)
+            except multiprocessing.TimeoutError:
+                row = getTimeoutRow(episode, options.timeout)
+                hung = True
+            writer.writerow(row)
+            resultsFile.flush()
+            print('[%d/%d] %s k=%d %s seed=%d: %s' % (
+                i + 1, len(todo), row['layout'], row['numCars'],
+                'parked' if row['parked'] else 'moving', row['seed'],
+                row['status'] if row['status'] != 'ok' else
+                ('win' if row['victory'] else 'crash' if row['collided'] else 'timeout')))
+    if hung:
+        # workers that are still stuck in an episode would block join()
+        pool.terminate()
+    else:
+        pool.close()
+    pool.join()
@@ -0,0 +1,269 @@
+'''
+Benchmarks of the simulation hot paths.
+
+Every benchmark builds its inputs from a fixed seed on one of the bundled
+layouts (m_small, m_val, m_lombard, and m_large from generateLayout.py) or
+on a synthetic one (m_lombard scaled up, with a transition model generated
+by engine/graphCreater/layoutGenerator.py), then times one call repeatedly.
+Results are the median and minimum seconds per call over several rounds.
+
+    python benchmark.py                     # run, compare with the baseline
+    python benchmark.py -o results.json     # also write the results
+    python benchmark.py --save-baseline     # make these the new baseline
+    python benchmark.py -b estimate         # only benchmarks matching
+
+A benchmark is flagged as a regression when its median is more than
+--tolerance slower than in benchmarks/baseline.json; with --check the
+script then exits with status 1.
+'''
+from engine.const import Const
+from engine.graphCreater import layoutGenerator
+from engine.planner import compiledLayout
+
+import copy
+import json
+import optparse
+import os
+import platform
+import random
+import sys
+import time
+
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+LAYOUTS = ['m_small', 'm_val', 'm_lombard', 'm_large']
+SCALED_LAYOUTS = [('m_lombard', 2)]
+NUM_CARS = 3
+SEED = 0
+
+
+# Function: Scale Layout Data
+# ---------------------
+# A copy of a layout's data with every length multiplied by factor: the
+# same map with factor times as many tiles in each direction.
+def scaleLayoutData(data, factor):
+    data = copy.deepcopy(data)
+    data['size'] = [length * factor for length in data['size']]
+    data['junior'] = [length * factor for length in data['junior']]
+    data['blocks'] = [[length * factor for length in block] for block in data['blocks']]
+    data['finish'] = [[length * factor for length in block] for block in data['finish']]
+    data['intersections']['nodes'] = [[length * factor for length in block]
+                                      for block in data['intersections']['nodes']]
+    for graph in ['agentGraph', 'juniorGraph']:
+        for node in data[graph]['nodes']:
+            node['pos'] = [length * factor for length in node['pos']]
+    return data
+
+
+class Scenario(object):
+
+    # With synthetic set, the estimators use a transition model generated
+    # for the layout instead of the one learned for the layout's name.
+    def __init__(self, name, layout, synthetic=False):
+        from engine.controller import Controller
+        Const.WORLD = layout.getWorldName()
+        Const.MULTIPLE_GOALS = True
+        Const.NUM_CHECKPTS = len(layout.getFinish())
+        Const.NUM_AGENTS = NUM_CARS
+        Const.CARS_PARKED = False
+        Const.SHOW_CARS = False
+        Const.AUTO = True
+        Const.INFERENCE = 'estimator'
+        Const.INTELLIGENT_DRIVER = False
+        Const.HEADLESS = True
+        random.seed(SEED)
+        self.name = name
+        self.layout = layout
+        self.controller = Controller(layout)
+        self.model = self.controller.model
+        self.transProb = layoutGenerator.getTransProb(layout) if synthetic else None
+        self.cars = self.model.getOtherCars()
+        junior = self.model.getJunior()
+        self.juniorPos = (junior.pos.x, junior.pos.y)
+        self.beliefs = []
+        for car in self.cars:
+            estimator = self.getEstimator()
+            for _ in range(3):
+                estimator.estimate(self.juniorPos[0], self.juniorPos[1], self.getDist(car), False)
+            self.beliefs.append(estimator.getBelief())
+
+    def getEstimator(self):
+        from estimator import Estimator
+        estimator = Estimator(self.model.getBeliefRows(), self.model.getBeliefCols())
+        if self.transProb is not None:
+            estimator.transProb = self.transProb
+        return estimator
+
+    def getDist(self, car):
+        return (car.pos - self.model.getJunior().pos).get_length()
+
+    def getIntelligentDriver(self):
+        from intelligentDriver import IntelligentDriver
+        from engine.vector import Vec2d
+        layout = self.layout
+        driver = IntelligentDriver(layout)
+        driver.setup(Vec2d(layout.getStartX(), layout.getStartY()), layout.getJuniorDir(), Vec2d(0, 0))
+        return driver
+
+
+# Function: Get Scenarios
+# ---------------------
+# Scenarios are built one at a time, as each one sets Const (Const.WORLD
+# selects the transition model Estimator loads) for its layout.
+def getScenarios():
+    from engine.model.layout import Layout
+    for name in LAYOUTS:
+        yield Scenario(name, Layout(name))
+    for name, factor in SCALED_LAYOUTS:
+        base = Layout(name)
+        layout = Layout(name, scaleLayoutData(base.data, factor))
+        yield Scenario('%s_x%d' % (name, factor), layout, synthetic=True)
+
+
+# Function: Get Estimate
+# ---------------------
+# One estimate() call from the same belief (and particles) every time, so
+# that repeated calls do not drift to a different (or degenerate) belief.
+def getEstimate(estimator, belief, x, y, dist, isParked):
+    particles = list(estimator.particles)
+
+    def estimate():
+        estimator.belief.grid = [row[:] for row in belief.grid]
+        estimator.particles = list(particles)
+        estimator.estimate(x, y, dist, isParked)
+    return estimate
+
+
+# Function: Get Benchmarks
+# ---------------------
+# (name, function) pairs for one scenario; every function runs one call of
+# the code under test on inputs prepared here.
+def getBenchmarks(scenario):
+    from engine.view.display import Display
+    import util
+    benchmarks = []
+    name = scenario.name
+    x, y = scenario.juniorPos
+    car = scenario.cars[0]
+    dist = scenario.getDist(car)
+
+    model = scenario.model
+    beliefs = scenario.beliefs
+    benchmarks.append((name + '/estimate.moving', getEstimate(scenario.getEstimator(), beliefs[0], x, y, dist, False)))
+    benchmarks.append((name + '/estimate.parked', getEstimate(scenario.getEstimator(), beliefs[0], x, y, dist, True)))
+    benchmarks.append((name + '/setProbCar', lambda: model.setProbCar(beliefs)))
+
+    controller = scenario.controller
+    car.getInference().belief = beliefs[0]
+    benchmarks.append((name + '/calculateErrorForCar', lambda: controller.calculateErrorForCar(car)))
+
+    junior = model.getJunior()
+    benchmarks.append((name + '/checkCollision', lambda: model.checkCollision(junior)))
+
+    Display.drawBelief(model)
+    benchmarks.append((name + '/updateBelief.headless', lambda: Display.updateBelief('blue', beliefs[0])))
+
+    driver = scenario.getIntelligentDriver()
+    benchmarks.append((name + '/createWorldGraph', driver.createWorldGraph))
+
+    # start-up with the compiled layout already on disk
+    def initDriver():
+        compiledLayout.loaded.clear()
+        scenario.getIntelligentDriver()
+    benchmarks.append((name + '/intelligentDriver.init', initDriver))
+    start = (util.yToRow(junior.pos.y), util.xToCol(junior.pos.x))
+    goal = scenario.layout.getCheckPoints()[-1]
+    parkedCars = [False] * len(beliefs)
+    benchmarks.append((name + '/getShortestPathUsingDijkstra',
+                       lambda: driver.getShortestPathUsingDijkstra(start, goal, beliefs, parkedCars)))
+
+    if scenario.transProb is None:
+        benchmarks.append((name + '/loadTransProb', util.loadTransProb))
+    return benchmarks
+
+
+# Function: Time Call
+# ---------------------
+# Seconds per call: the call is repeated until a round takes at least
+# minTime, and the median and minimum over rounds are returned.
+def timeCall(function, rounds, minTime):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= minTime or number >= 1 << 20: break
+        number *= 2
+    perCall = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        perCall.append((time.perf_counter() - start) / number)
+    perCall.sort()
+    return {'median': perCall[len(perCall) // 2], 'min': perCall[0], 'number': number, 'rounds': rounds}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        line = '%-50s %10.3f ms' % (name, 1000 * result['median'])
+        if name in baseline:
+            ratio = result['median'] / baseline[name]['median']
+            line += '  x%.2f' % ratio
+            if ratio > 1 + tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+            elif ratio < 1 / (1 + tolerance):
+                line += '  improved'
+        print(line)
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = optparse.OptionParser()
+    parser.add_option('-b', '--bench', dest='bench', default='', help='only run benchmarks whose name contains this')
+    parser.add_option('-r', '--rounds', type='int', dest='rounds', default=5)
+    parser.add_option('--minTime', type='float', dest='minTime', default=0.05, help='seconds per round')
+    parser.add_option('-o', '--output', dest='output', default=None)
+    parser.add_option('--baseline', dest='baseline', default=BASELINE_PATH)
+    parser.add_option('--save-baseline', dest='saveBaseline', default=False, action='store_true')
+    parser.add_option('--tolerance', type='float', dest='tolerance', default=0.25)
+    parser.add_option('--check', dest='check', default=False, action='store_true')
+    (options, _) = parser.parse_args()
+
+    results = {}
+    for scenario in getScenarios():
+        for name, function in getBenchmarks(scenario):
+            if options.bench not in name: continue
+            random.seed(SEED)
+            results[name] = timeCall(function, options.rounds, options.minTime)
+
+    output = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as baselineFile:
+            baseline = json.load(baselineFile)['results']
+    regressions = compare(results, baseline, options.tolerance)
+
+    if options.output:
+        with open(options.output, 'w') as outputFile:
+            json.dump(output, outputFile, indent=2, sort_keys=True)
+    if options.saveBaseline:
+        # benchmarks that were not run (see -b) keep their baseline
+        output['results'] = dict(baseline, **results)
+        if not os.path.isdir(os.path.dirname(options.baseline)):
+            os.makedirs(os.path.dirname(options.baseline))
+        with open(options.baseline, 'w') as baselineFile:
+            json.dump(output, baselineFile, indent=2, sort_keys=True)
+        print('Baseline written to ' + options.baseline)
+    if regressions:
+        print('%d regression(s) against %s' % (len(regressions), options.baseline))
+        if options.check: sys.exit(1)
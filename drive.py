@@ -7,6 +7,7 @@ Chris Piech (piech@cs.stanford.edu). It was inspired by the Pacman projects.
 from engine.const import Const
 from engine.controller import Controller
 from engine.view.display import Display
+from engine.profiler import profiler
 
 import sys
 import optparse
@@ -31,8 +32,23 @@ if __name__ == '__main__':
     parser.add_option('-f', '--fixedSeed', dest='fixedSeed', default=False, action='store_true')
     parser.add_option('-m', '--checkpoints', dest='checkpoints', default=False, action='store_true')
     parser.add_option('-j', '--intelligentDriver', dest='intelligentDriver', default=False, action='store_true')
+    parser.add_option('-t', '--planner', dest='planner', default='dijkstra')
+    parser.add_option('-w', '--asyncPlanner', dest='asyncPlanner', default=False, action='store_true')
+    parser.add_option('-r', '--routeLibrary', dest='routeLibrary', default=False, action='store_true')
+    parser.add_option('-x', '--riskVeto', dest='riskVeto', default=False, action='store_true')
+    parser.add_option('-g', '--replanGating', dest='replanGating', default=False, action='store_true')
+    parser.add_option('-n', '--headless', dest='headless', default=False, action='store_true')
+    parser.add_option('-u', '--turbo', dest='turbo', default=False, action='store_true')
+    parser.add_option('--profile', dest='profile', default=None, metavar='TRACE_FILE')
+    parser.add_option('--record', dest='record', default=None, metavar='FILE')
+    parser.add_option('--errorEvery', type='int', dest='errorEvery', default=1, metavar='N',
+                      help='score the beliefs every N ticks')
 
     (options, _) = parser.parse_args()
+    if options.planner not in Const.PLANNER_TYPES:
+        parser.error('planner must be one of ' + ', '.join(Const.PLANNER_TYPES))
+    if options.errorEvery < 1:
+        parser.error('errorEvery must be at least 1')
     
     Const.WORLD = options.layout
     Const.CARS_PARKED = options.parked
@@ -45,6 +61,14 @@ if __name__ == '__main__':
     Const.AUTO = options.auto
 
     Const.INTELLIGENT_DRIVER = options.intelligentDriver
+    Const.PLANNER = options.planner
+    Const.ASYNC_PLANNER = options.asyncPlanner
+    Const.ROUTE_WARM_START = options.routeLibrary
+    Const.RISK_VETO = options.riskVeto
+    Const.REPLAN_GATING = options.replanGating
+    Const.HEADLESS = options.headless
+    Const.TURBO = options.turbo
+    Const.ERROR_SAMPLE_TICKS = options.errorEvery
     Const.MULTIPLE_GOALS = options.checkpoints
     if options.checkpoints:
         Const.WORLD = 'm_'+str(Const.WORLD)
@@ -62,15 +86,31 @@ if __name__ == '__main__':
 
     
     # Fix the random seed
-    if options.fixedSeed: random.seed('driverlessCar')
+    if options.fixedSeed:
+        Const.SEED = 'driverlessCar'
+    elif options.record:
+        # a known seed, so the recorded episode can be rerun
+        Const.SEED = random.randrange(2 ** 31)
+    if Const.SEED is not None: random.seed(Const.SEED)
+    Const.TRACE_FILE = options.record
+
+    if options.profile: profiler.enable()
 
     controller = Controller()
     start = time.time()
     quit = controller.drive()
     end = time.time()
     if not quit:
-        controller.freezeFrame()
+        if not Const.HEADLESS:
+            controller.freezeFrame()
         print(f"Simulation time: {end-start} seconds")
+        if Const.TURBO:
+            print(f"Simulated time: {controller.getSimTime():.2f} seconds")
+
+    if options.profile:
+        profiler.printSummary()
+        profiler.writeTrace(options.profile)
+        print('Trace written to ' + options.profile)
 
     print('closing...')
     Display.endGraphics()
@@ -0,0 +1,52 @@
+'''
+The belief error metric: the expected squared tile distance between a
+belief and the true tile of its car.
+
+The squared distance splits into a row and a column term, so the error is
+    sum over rows r of rowMass[r] * (r - carRow) ** 2
+  + sum over cols c of colMass[c] * (c - carCol) ** 2
+where rowMass and colMass are the marginals of the belief. The marginals
+are built with sum() over the grid rows and their transpose, and the
+squared offsets from every row and column are tabulated once per layout,
+so scoring a belief costs two builtin passes over the grid instead of a
+Python loop over every tile.
+'''
+import operator
+
+
+class BeliefError(object):
+
+    def __init__(self, numRows, numCols):
+        self.numRows = numRows
+        self.numCols = numCols
+        # rowSquares[R][r] == (r - R) ** 2, colSquares[C][c] == (c - C) ** 2
+        self.rowSquares = [self.getSquares(numRows, row) for row in range(numRows)]
+        self.colSquares = [self.getSquares(numCols, col) for col in range(numCols)]
+
+    def getSquares(self, length, origin):
+        return [(i - origin) ** 2 for i in range(length)]
+
+    def getRowSquares(self, row):
+        if 0 <= row < self.numRows: return self.rowSquares[row]
+        return self.getSquares(self.numRows, row)
+
+    def getColSquares(self, col):
+        if 0 <= col < self.numCols: return self.colSquares[col]
+        return self.getSquares(self.numCols, col)
+
+    # Function: Get Error
+    # ---------------------
+    # Error of belief (a util.Belief) for a car in tile (row, col). The
+    # belief total comes with the marginals, so the sum-to-1 check is free.
+    def getError(self, belief, row, col):
+        grid = belief.grid
+        rowMass = list(map(sum, grid))
+        colMass = list(map(sum, zip(*grid)))
+        if abs(sum(rowMass) - 1.0) > 0.001:
+            raise Exception('belief does not sum to 1. Use the normalize method.')
+        return (sum(map(operator.mul, rowMass, self.getRowSquares(row))) +
+                sum(map(operator.mul, colMass, self.getColSquares(col))))
+
+    # Errors of every belief, for cars in the given (row, col) tiles.
+    def getErrors(self, beliefs, tiles):
+        return [self.getError(belief, row, col) for belief, (row, col) in zip(beliefs, tiles)]
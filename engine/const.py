@@ -10,6 +10,8 @@ class Const(object):
     TRAIN_PER_AGENT_COUNT = 4
     
     LAYOUT_DIR = 'layouts'
+    LAYOUT_CACHE_DIR = 'layouts/cache'
+    COMPILE_LAYOUTS = True # keep the planners' static tables in LAYOUT_CACHE_DIR
     
     BLOCK_TILE_SIZE = 30
     BELIEF_TILE_SIZE = 30
@@ -29,9 +31,58 @@ class Const(object):
 
     HEARTBEATS_PER_SECOND = HEARTBEAT_DICT[SIM_SPEED]
     SECONDS_PER_HEARTBEAT = 1.0 / HEARTBEATS_PER_SECOND
+
+    HEADLESS = False # no window, see engine/view/headlessGraphics.py
+    TURBO = False # single-threaded fixed timestep, see Controller.runTurbo
+    TURBO_TIME_OUT = 600.0 # simulated seconds before a turbo episode times out
+    SLO_WINDOW = 10.0 # seconds over which missed deadlines are rated
+
+    SEED = None # random seed of the run, if known (stored in traces)
+    TRACE_FILE = None # record the episode there, see engine/trace.py
+    ERROR_SAMPLE_TICKS = 1 # score the beliefs every N controller ticks
     
     EPSILON = 0.0001
 
+    FORECAST_HORIZON = 5
+
+    CLEARANCE_WALL_DIST = 1.0 # tiles
+    CLEARANCE_SAFE_DIST = 2.0 # tiles
+    CLEARANCE_COST_WEIGHT = 2.0
+
+    PLANNER_TYPES = ['dijkstra', 'spaceTime', 'anytime', 'hierarchical']
+    PLANNER = 'dijkstra'
+
+    SPACE_TIME_MAX_NODES = 4000
+    SPACE_TIME_MAX_OPEN = 2000
+    SPACE_TIME_TIME_FRACTION = 0.5
+    SPACE_TIME_BLOCKED_PROB = 0.3
+    SPACE_TIME_WAIT_COST = 1.0
+    SPACE_TIME_OCCUPANCY_WEIGHT = 100.0
+    SPACE_TIME_MAX_WAIT = 40
+
+    HIERARCHICAL_SEGMENT_TILES = 6
+    HIERARCHICAL_REACHED_TILES = 1
+
+    REPLAN_GATING = False
+    REPLAN_TOLERANCE = 1.0 # edge cost
+
+    RISK_VETO = False
+    RISK_PARTICLES = 200 # per car
+    RISK_STEPS = 3 # estimator ticks
+    RISK_THRESHOLD = 0.1
+    RISK_MAX_WAIT = 20
+
+    ROUTE_WARM_START = False
+    ROUTE_LOOKAHEAD = 4 # tiles
+    ROUTE_DEVIATION_PROB = 0.0005
+
+    ANYTIME_EPSILON_START = 3.0
+    ANYTIME_EPSILON_STEP = 0.5
+    ANYTIME_TIME_FRACTION = 0.5
+
+    ASYNC_PLANNER = False
+    ASYNC_MAX_PLAN_AGE = 1.0 # seconds
+
     NUM_CHECKPTS = 3
     MULTIPLE_GOALS = False
     INTELLIGENT_DRIVER = False
@@ -0,0 +1,110 @@
+'''
+Fixed-memory statistics over a stream of non-negative values (latencies).
+
+StreamingStats keeps the count, min, max, mean and variance (Welford's
+algorithm) and a log-bucketed histogram in the style of HDR histograms:
+bucket i holds the values in [MIN_VALUE * (1 + PRECISION) ** i,
+MIN_VALUE * (1 + PRECISION) ** (i + 1)), so percentiles are exact to within
+PRECISION relative error, and a stream of seconds between 1us and 1000s
+needs at most about 2000 buckets whatever its length.
+
+WindowedRate counts events over the last few seconds.
+'''
+import collections
+import math
+import time
+
+
+class StreamingStats(object):
+
+    MIN_VALUE = 1e-6
+    PRECISION = 0.01
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = {}
+        self.logBase = math.log(1 + StreamingStats.PRECISION)
+
+    def addValue(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+        bucket = self.getBucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    # Values below MIN_VALUE share bucket -1.
+    def getBucket(self, value):
+        if value < StreamingStats.MIN_VALUE: return -1
+        return int(math.log(value / StreamingStats.MIN_VALUE) / self.logBase)
+
+    def getBucketValue(self, bucket):
+        if bucket < 0: return 0.0
+        return StreamingStats.MIN_VALUE * (1 + StreamingStats.PRECISION) ** (bucket + 0.5)
+
+    def getCount(self):
+        return self.count
+
+    def getMean(self):
+        return self.mean
+
+    def getMin(self):
+        return self.min
+
+    def getMax(self):
+        return self.max
+
+    def getVariance(self):
+        if self.count < 2: return 0.0
+        return self.m2 / (self.count - 1)
+
+    def getStd(self):
+        return math.sqrt(self.getVariance())
+
+    # Function: Get Percentile
+    # ---------------------
+    # The p-th percentile (0 < p <= 100) by nearest rank, read from the
+    # histogram and clamped to the exact min and max.
+    def getPercentile(self, p):
+        if self.count == 0: return None
+        rank = max(1, int(math.ceil(p / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(max(self.getBucketValue(bucket), self.min), self.max)
+        return self.max
+
+
+class WindowedRate(object):
+
+    def __init__(self, window):
+        # seconds
+        self.window = window
+        self.times = collections.deque()
+        self.total = 0
+
+    def addEvent(self, now=None):
+        if now is None: now = time.time()
+        self.total += 1
+        self.times.append(now)
+        self.expire(now)
+
+    def expire(self, now):
+        while self.times and self.times[0] <= now - self.window:
+            self.times.popleft()
+
+    # Events per second over the last window.
+    def getRate(self, now=None):
+        if now is None: now = time.time()
+        self.expire(now)
+        return len(self.times) / self.window
+
+    def getTotal(self):
+        return self.total
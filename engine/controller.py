@@ -3,25 +3,32 @@ from .model.model import Model
 from .const import Const
 from .view.display import Display
 from .model.layout import Layout
+from .model.car.car import Car
 from .vector import Vec2d
 from .containers.counter import Counter
+from .containers.streamingStats import StreamingStats, WindowedRate
 from .userThread import UserThread
+from .profiler import profiler
+from .trace import TraceRecorder
+from .beliefError import BeliefError
 import util as util
-from .view import graphicsUtils
 import time
-import math
 import sys
 import traceback
 
 class Controller(object):
     
-    def __init__(self):
-        self.layout = Layout(Const.WORLD)
+    def __init__(self, layout=None):
+        self.layout = layout if layout is not None else Layout(Const.WORLD)
         Display.initGraphics(self.layout)
         self.model = Model(self.layout)
         self.carChanges = {}
         self.errorCounter = Counter()
+        self.beliefError = BeliefError(self.layout.getBeliefRows(), self.layout.getBeliefCols())
         self.consecutiveLate = 0
+        self.recorder = None
+        if Const.TRACE_FILE:
+            self.recorder = TraceRecorder(Const.WORLD, Const.NUM_AGENTS, Const.SEED)
         
     def learn(self, learner):
         self.isLearning = True
@@ -35,29 +42,83 @@ class Controller(object):
     def run(self):
         self.render()
         self.userThread = UserThread(self.model.junior, self.model)
-        self.userThread.start()
         self.iteration = 0
+        self.timedOut = False
+        self.phaseTimes = {'infer': 0.0, 'action': 0.0, 'update': 0.0, 'draw': 0.0, 'ui': 0.0}
+        self.tickStats = StreamingStats()
+        self.missedDeadlines = WindowedRate(Const.SLO_WINDOW)
+        if Const.TURBO:
+            self.runTurbo()
+        else:
+            self.runRealTime()
+        if not self.userThread.quit and not self.isLearning:
+            self.outputGameResult()
+        self.userThread.stop()
+        if not Const.TURBO:
+            Display.graphicsSleep(0.1)
+            self.userThread.join()
+        if self.recorder is not None:
+            self.recorder.write(Const.TRACE_FILE)
+        return self.userThread.quit
+
+    def runRealTime(self):
+        self.userThread.start()
         while not self.isGameOver():
             self.resetTimes()
             startTime = time.time()
 
             # self.printStats()
         
-            self.otherCarUpdate()
-            self.calculateError()
+            with profiler.span('tick'):
+                self.otherCarUpdate()
+                with profiler.span('calculateError'):
+                    self.calculateError()
+            self.addTimes()
                         
             duration = time.time() - startTime
+            self.recordTick(duration)
             timeToSleep = Const.SECONDS_PER_HEARTBEAT - duration
             # self.checkLate(timeToSleep)
             timeToSleep = max(0.01, timeToSleep)
             Display.graphicsSleep(timeToSleep)
             self.iteration += 1
-        if not self.userThread.quit and not self.isLearning:
-            self.outputGameResult()
-        self.userThread.stop()
-        Display.graphicsSleep(0.1)
-        self.userThread.join()
-        return self.userThread.quit
+
+    # Function: Run Turbo
+    # ---------------------
+    # Fixed-timestep version of runRealTime: controller and UI heartbeats run
+    # on this thread, interleaved by simulated time (each controller tick is
+    # followed by the UI heartbeats that fall within it) and without sleeping.
+    # The episode times out after Const.TURBO_TIME_OUT simulated seconds
+    # (or Const.TIME_OUT, if that is shorter), so a stuck AutoCar cannot
+    # keep it spinning.
+    def runTurbo(self):
+        uiBeats = 0
+        while not self.isGameOver():
+            self.resetTimes()
+            startTime = time.time()
+            with profiler.span('tick'):
+                self.otherCarUpdate()
+                with profiler.span('calculateError'):
+                    self.calculateError()
+            self.addTimes()
+            self.recordTick(time.time() - startTime)
+            self.iteration += 1
+            simTime = self.getSimTime()
+            start = time.time()
+            while (uiBeats + 1) * Const.SECONDS_PER_UI_HEARTBEAT <= simTime + Const.EPSILON:
+                if self.userThread.shouldStop(): break
+                self.userThread.heartbeat()
+                uiBeats += 1
+            self.phaseTimes['ui'] += time.time() - start
+            Display.refresh()
+            if simTime >= min(Const.TIME_OUT, Const.TURBO_TIME_OUT):
+                self.timedOut = True
+                break
+
+    # Seconds of simulated time so far (controller ticks times the tick
+    # length).
+    def getSimTime(self):
+        return self.iteration * Const.SECONDS_PER_HEARTBEAT
         
     def freezeFrame(self):
         while True:
@@ -73,8 +134,36 @@ class Controller(object):
         print('* GAME OVER                     *')
         if collided:
             print('* CAR CRASH!!!!!')
+        elif self.timedOut:
+            print('* TIME OUT')
         else:
             print('* You Win!')
+        if self.userThread.plannerWorker:
+            stats = self.userThread.plannerWorker.getStats()
+            print('* Plans: %d, mean age %.3fs, max age %.3fs' % (
+                stats['plans'], stats['meanPlanAge'], stats['maxPlanAge']))
+        junior = self.model.getJunior()
+        if Const.INTELLIGENT_DRIVER and junior.numPlanRequests:
+            print('* Replans skipped: %d/%d (%.1f%%)' % (
+                junior.getNumReplansSkipped(), junior.numPlanRequests,
+                100.0 * junior.getNumReplansSkipped() / junior.numPlanRequests))
+        if Const.INTELLIGENT_DRIVER and junior.anytimePlanner is not None:
+            anytimePlanner = junior.anytimePlanner
+            print('* Anytime deadline hits: %d/%d (%.1f%%)' % (
+                anytimePlanner.numDeadlineHits, anytimePlanner.numCalls,
+                100.0 * anytimePlanner.getDeadlineHitRate()))
+        if Const.INTELLIGENT_DRIVER and junior.spaceTimePlanner is not None:
+            spaceTimePlanner = junior.spaceTimePlanner
+            print('* Space-time budget hits: %d/%d (%.1f%%), mean expansions %.0f' % (
+                spaceTimePlanner.numBudgetHits, spaceTimePlanner.numPlans,
+                100.0 * spaceTimePlanner.getBudgetHitRate(), spaceTimePlanner.getMeanExpanded()))
+        if Const.INTELLIGENT_DRIVER and junior.collisionRisk is not None:
+            print('* Risk checks: %d, cache hits %.1f%%' % (
+                junior.collisionRisk.numRequests, 100.0 * junior.collisionRisk.getHitRate()))
+        print('* Car geometry reused: %.1f%%' % (100 * Car.getGeometryReuseRate()))
+        printLatency('Tick', self.tickStats, self.missedDeadlines)
+        printLatency('Heartbeat', self.userThread.heartbeatStats, self.userThread.missedHeartbeats)
+        printLatency('Plan', self.userThread.getPlanStats())
         print('*********************************')    
         
             
@@ -116,6 +205,27 @@ class Controller(object):
         self.drawTime = 0
         self.updateTime = 0
 
+    # Adds this tick's times to the episode totals. The UI heartbeats run on
+    # their own thread except in turbo mode, so 'ui' is only filled there.
+    def addTimes(self):
+        self.phaseTimes['infer'] += self.inferTime
+        self.phaseTimes['action'] += self.actionTime
+        self.phaseTimes['update'] += self.updateTime
+        self.phaseTimes['draw'] += self.drawTime
+
+    def getPhaseTimes(self):
+        return self.phaseTimes
+
+    # A tick misses its deadline when it takes longer than the heartbeat it
+    # runs in (in turbo mode: when it could not have kept up in real time).
+    def recordTick(self, duration):
+        self.tickStats.addValue(duration)
+        if duration > Const.SECONDS_PER_HEARTBEAT:
+            self.missedDeadlines.addEvent()
+
+    def getTickStats(self):
+        return self.tickStats
+
     def printStats(self):
         if self.isLearning: return
         if self.iteration == 0: return
@@ -136,19 +246,24 @@ class Controller(object):
 
     def otherCarUpdate(self):
         if True or Const.INFERENCE != 'none':
-            self.infer()
-        self.act()
-        self.move(self.model.getOtherCars())
+            with profiler.span('infer'):
+                self.infer()
+        with profiler.span('act'):
+            self.act()
+        with profiler.span('move'):
+            self.moveFleet(self.model.getOtherCars())
         
     def observe(self):
         if self.isLearning: return
         juniorX = self.model.junior.pos.x
         juniorY = self.model.junior.pos.y
+        sonar = []
         
         for car in self.model.getOtherCars():
         # for idx, car in enumerate(self.model.getOtherCars()): 
             observation = car.getObservation(self.model.junior)
             obsDist = observation.getDist() 
+            sonar.append(obsDist)
             # print(f"ob{idx}: {obsDist}")                     
             inference = car.getInference() 
             parkedCar = car.getParkedStatus()
@@ -157,6 +272,11 @@ class Controller(object):
                 inference.estimate(juniorX, juniorY, obsDist, parkedCar)
             else:
                 inference.observe(juniorX, juniorY, obsDist)
+
+        if self.recorder is not None:
+            cars = self.model.getOtherCars()
+            self.recorder.addTick(self.model.junior, self.model.nextCheckPtIdx, cars, sonar,
+                                  [car.getParkedStatus() for car in cars])
    
     def elapseTime(self):
         if self.isLearning: return
@@ -180,10 +300,13 @@ class Controller(object):
 
         try:
             if Const.INFERENCE == 'estimator':
-                self.observe()
+                with profiler.span('observe'):
+                    self.observe()
             else:
-                self.elapseTime()
-                self.observe()
+                with profiler.span('elapseTime'):
+                    self.elapseTime()
+                with profiler.span('observe'):
+                    self.observe()
         except  Exception as e:
             print('caught')
             traceback.print_exc()
@@ -194,7 +317,8 @@ class Controller(object):
             
         inferEnd = time.time()
         self.inferTime += inferEnd - start
-        self.updateBeliefs()
+        with profiler.span('updateBeliefs'):
+            self.updateBeliefs()
         self.drawTime += time.time() - inferEnd
         
     def act(self):
@@ -220,35 +344,43 @@ class Controller(object):
             if self.isLearning:
                 self.learner.noteCarMove(oldPos, newPos)
             
+    # Same as move, but the StdCars are stepped together by the fleet.
+    def moveFleet(self, cars):
+        oldDirs = [Vec2d(car.dir.x, car.dir.y) for car in cars]
+        oldPositions = [Vec2d(car.pos.x, car.pos.y) for car in cars]
+        start = time.time()
+        if not Const.CARS_PARKED:
+            self.model.getFleet().update()
+            self.model.updateSpatialHash()
+        self.updateTime += time.time() - start
+        for car, oldDir, oldPos in zip(cars, oldDirs, oldPositions):
+            newPos = car.getPos()
+            newDir = car.getDir()
+            deltaPos = newPos - oldPos
+            deltaAngle = oldDir.get_angle_between(newDir)
+            if Const.SHOW_CARS or car.isJunior():
+                self.moveCarDisplay(car, deltaPos, deltaAngle)
+
+            if self.isLearning:
+                self.learner.noteCarMove(oldPos, newPos)
+
+    # Scores the beliefs every Const.ERROR_SAMPLE_TICKS ticks.
     def calculateError(self):
         if self.isLearning: return
         #if Const.INFERENCE == 'none': return
-        if len(self.model.getOtherCars()) == 0: return
-        errors = []
-        for car in self.model.getOtherCars():
-            error = self.calculateErrorForCar(car)
-            errors.append(error)
+        cars = self.model.getOtherCars()
+        if len(cars) == 0: return
+        if self.iteration % Const.ERROR_SAMPLE_TICKS != 0: return
+        beliefs = [car.getInference().getBelief() for car in cars]
+        tiles = [(util.yToRow(car.getPos().y), util.xToCol(car.getPos().x)) for car in cars]
+        errors = self.beliefError.getErrors(beliefs, tiles)
         aveError = float(sum(errors)) / len(errors)
         self.errorCounter.addValue(aveError)
     
     def calculateErrorForCar(self, otherCar):
         pos = otherCar.getPos()
-        carRow = util.yToRow(pos.y)
-        carCol = util.xToCol(pos.x)
         belief = otherCar.getInference().getBelief()
-        total = belief.getSum()
-        if abs(total - 1.0) > 0.001:
-            raise Exception('belief does not sum to 1. Use the normalize method.')
-        totalError = 0
-        for r in range(belief.getNumRows()):
-            for c in range(belief.getNumCols()):
-                prob = belief.getProb(r, c)
-                difRow = r - carRow
-                difCol = c - carCol
-                error = math.sqrt(difRow ** 2 + difCol ** 2)
-                errorSquared = error ** 2
-                totalError += errorSquared * prob
-        return totalError
+        return self.beliefError.getError(belief, util.yToRow(pos.y), util.xToCol(pos.x))
 
 
     def moveCarDisplay(self, car, deltaPos, deltaAngle):
@@ -273,4 +405,19 @@ class Controller(object):
             for checkpt in self.model.getFinish():
                 Display.drawFinish(checkpt) 
           
-        graphicsUtils.refresh()
+        Display.refresh()
+
+
+# Function: Print Latency
+# ---------------------
+# One line of the game over banner: p50/p95/p99 and max of a latency stream,
+# and how many deadlines were missed.
+def printLatency(name, stats, missed=None):
+    if stats.getCount() == 0: return
+    line = '* %s latency p50/p95/p99/max: %.1f/%.1f/%.1f/%.1f ms' % (
+        name, 1000 * stats.getPercentile(50), 1000 * stats.getPercentile(95),
+        1000 * stats.getPercentile(99), 1000 * stats.getMax())
+    if missed is not None:
+        line += ', missed %d/%d (%.2f/s over the last %ds)' % (
+            missed.getTotal(), stats.getCount(), missed.getRate(), missed.window)
+    print(line)
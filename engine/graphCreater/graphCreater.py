@@ -4,20 +4,41 @@ from .intersection import *
 
 class GraphCreater(object):
     
-    def __init__(self, fileName):
-        self.layout = Layout(fileName)
+    def __init__(self, fileName=None):
+        self.layout = Layout(fileName) if fileName is not None else None
     
     def run(self):
-        data = self.layout.getIntersectionData()
-        self.interDict = self.getInterDict(data)
-        self.edgeDict = self.getEdgeDict(data)
-        self.createExteralConnections()
-        self.createInternalConnections()
+        self.build(self.layout.getIntersectionData())
         print('"agentGraph": {')
         self.outputNodes()
         self.outputEdges()
         print('}')
         
+    # Function: Build
+    # ---------------------
+    # Creates the lane nodes and edges of every intersection from the
+    # intersections data of a layout. Node ids start at 0.
+    def build(self, data):
+        IntersectionNode.idCounter = 0
+        self.interDict = self.getInterDict(data)
+        self.edgeDict = self.getEdgeDict(data)
+        self.createExteralConnections()
+        self.createInternalConnections()
+
+    # The built graph in the layout's "agentGraph" format.
+    def getGraphData(self):
+        nodes = []
+        edges = []
+        for interId in self.interDict:
+            for node in self.interDict[interId].getAllNodes():
+                nodes.append({'id': node.getId(), 'pos': [round(node.pos.x, 3), round(node.pos.y, 3)], 'dir': node.dir})
+                for other in node.getEdges():
+                    edges.append([node.getId(), other.getId()])
+        return {'nodes': nodes, 'edges': edges}
+
+    def getIntersection(self, interId):
+        return self.interDict[interId]
+
     def outputEdges(self):
         allEdges = []
         for interId in self.interDict:
@@ -113,6 +113,9 @@ class Intersection(object):
             nodes.append(self.centerNode)
         return nodes
     
+    def getSide(self, sideName):
+        return self.sides[sideName]
+
     def getAllEdgeStrings(self):
         nodes = self.getAllNodes()
         allEdges = []
@@ -0,0 +1,169 @@
+'''
+Generates city-grid layouts of any size, for scaling tests.
+
+The world is a grid of numBlocksX x numBlocksY square blocks (obstacles)
+separated by roads; every road crossing is an intersection. The agent graph
+is built from the intersections by GraphCreater, the AutoCar starts in the
+bottom-left intersection heading east, and its junior graph leads from
+there into the agent graph and out of the top-right intersection to the
+east edge. Sizes are in block units (Const.BLOCK_TILE_SIZE pixels).
+
+getTransProb() gives a transition model in the format of the learned ones
+for any layout: StdCars follow the lanes of the agent graph.
+'''
+from engine.const import Const
+from engine.graphCreater.graphCreater import GraphCreater
+
+import random
+import util
+
+
+class LayoutGenerator(object):
+
+    def __init__(self, numBlocksX, numBlocksY, blockSize=8, roadSize=4, seed=0):
+        assert numBlocksX >= 1 and numBlocksY >= 1
+        self.numBlocksX = numBlocksX
+        self.numBlocksY = numBlocksY
+        self.blockSize = blockSize
+        self.roadSize = roadSize
+        self.period = blockSize + roadSize
+        self.seed = seed
+
+    def getWidth(self):
+        return self.numBlocksX * self.period + self.roadSize
+
+    def getHeight(self):
+        return self.numBlocksY * self.period + self.roadSize
+
+    # Intersections are numbered row by row, from the top-left.
+    def getIntersectionId(self, i, j):
+        return j * (self.numBlocksX + 1) + i
+
+    def getIntersectionData(self):
+        nodes = []
+        edges = {}
+        for j in range(self.numBlocksY + 1):
+            for i in range(self.numBlocksX + 1):
+                x = i * self.period
+                y = j * self.period
+                nodes.append([x, y, x + self.roadSize, y + self.roadSize])
+                neighbours = []
+                if j > 0: neighbours.append(self.getIntersectionId(i, j - 1))
+                if i > 0: neighbours.append(self.getIntersectionId(i - 1, j))
+                if i < self.numBlocksX: neighbours.append(self.getIntersectionId(i + 1, j))
+                if j < self.numBlocksY: neighbours.append(self.getIntersectionId(i, j + 1))
+                edges[str(self.getIntersectionId(i, j))] = neighbours
+        return {'nodes': nodes, 'edges': edges}
+
+    def getBlocks(self):
+        blocks = []
+        for j in range(self.numBlocksY):
+            for i in range(self.numBlocksX):
+                x = i * self.period + self.roadSize
+                y = j * self.period + self.roadSize
+                blocks.append([x, y, x + self.blockSize, y + self.blockSize])
+        return blocks
+
+    # Function: Get Check Points
+    # ---------------------
+    # One-tile checkpoints at the centres of distinct intersections, picked
+    # with the generator's seed; the last one is the top-right intersection.
+    def getCheckPoints(self, numCheckPoints):
+        start = self.getIntersectionId(0, self.numBlocksY)
+        last = self.getIntersectionId(self.numBlocksX, 0)
+        others = [interId for interId in range((self.numBlocksX + 1) * (self.numBlocksY + 1))
+                  if interId != start and interId != last]
+        chosen = random.Random(self.seed).sample(others, min(numCheckPoints - 1, len(others)))
+        checkPoints = []
+        for interId in chosen + [last]:
+            j, i = divmod(interId, self.numBlocksX + 1)
+            x = i * self.period + self.roadSize // 2
+            y = j * self.period + self.roadSize // 2
+            checkPoints.append([x, y, x + 1, y + 1])
+        return checkPoints
+
+    # Function: Get Data
+    # ---------------------
+    # The layout data, as in layouts/<world>.json. With numCheckPoints the
+    # finish is a list of checkpoints (the m_ layouts), otherwise it is the
+    # east end of the top road.
+    def getData(self, numCheckPoints=None):
+        tileSize = Const.BLOCK_TILE_SIZE
+        intersections = self.getIntersectionData()
+        creater = GraphCreater()
+        creater.build(intersections)
+        agentGraph = creater.getGraphData()
+
+        startInter = creater.getIntersection(self.getIntersectionId(0, self.numBlocksY))
+        endInter = creater.getIntersection(self.getIntersectionId(self.numBlocksX, 0))
+        entryNode = startInter.getSide('east').getOut()
+        exitNode = endInter.getSide('west').getIn()
+        juniorX = self.roadSize / 2.0 * tileSize
+        juniorY = (self.numBlocksY * self.period + self.roadSize / 2.0) * tileSize
+        startId = len(agentGraph['nodes'])
+        juniorGraph = {
+            'nodes': [
+                {'id': startId, 'pos': [juniorX, juniorY], 'dir': 'east'},
+                {'id': startId + 1, 'pos': [self.getWidth() * tileSize, exitNode.pos.y],
+                 'dir': 'east', 'terminal': True},
+            ],
+            'edges': [[startId, entryNode.getId()], [exitNode.getId(), startId + 1]],
+        }
+
+        if numCheckPoints is None:
+            finish = [self.getWidth() - 1, 0, self.getWidth(), self.roadSize]
+        else:
+            finish = self.getCheckPoints(numCheckPoints)
+        return {
+            'size': [self.getWidth() * tileSize, self.getHeight() * tileSize],
+            'junior': [juniorX, juniorY],
+            'juniorDir': 'east',
+            'blockUnitSize': tileSize,
+            'blocks': self.getBlocks(),
+            'finish': finish,
+            'intersections': intersections,
+            'agentGraph': agentGraph,
+            'juniorGraph': juniorGraph,
+        }
+
+
+# Function: Get Trans Prob
+# ---------------------
+# A transition model for layout in the format of util.loadTransProb(). Every
+# agent graph edge is walked in steps of a quarter tile; each step from one
+# tile into the next counts once, and a car stays in its tile as often as
+# it leaves it. Tiles off the lanes have no transitions, as in the learned
+# models.
+def getTransProb(layout):
+    numRows = layout.getBeliefRows()
+    numCols = layout.getBeliefCols()
+    step = Const.BELIEF_TILE_SIZE / 4.0
+
+    def getTile(x, y):
+        row = min(max(util.yToRow(y), 0), numRows - 1)
+        col = min(max(util.xToCol(x), 0), numCols - 1)
+        return (row, col)
+
+    agentGraph = layout.getAgentGraph()
+    counts = {}
+    for nodeId, nextIds in agentGraph.pathGraph.items():
+        start = agentGraph.getNode(nodeId).getPos()
+        for nextId in nextIds:
+            end = agentGraph.getNode(nextId).getPos()
+            numSteps = max(1, int((end - start).get_length() / step))
+            tile = getTile(start.x, start.y)
+            for k in range(1, numSteps + 1):
+                pos = start + (end - start) * (float(k) / numSteps)
+                nextTile = getTile(pos.x, pos.y)
+                if nextTile == tile: continue
+                counts.setdefault(tile, {})
+                counts[tile][nextTile] = counts[tile].get(nextTile, 0) + 1
+                tile = nextTile
+
+    transProb = {}
+    for tile, nextTiles in counts.items():
+        total = 2.0 * sum(nextTiles.values())
+        transProb[(tile, tile)] = 0.5
+        for nextTile, count in nextTiles.items():
+            transProb[(tile, nextTile)] = count / total
+    return transProb
@@ -0,0 +1,64 @@
+'''
+Rasterized lookup of axis-aligned blocks.
+
+The plane is cut into Const.BLOCK_TILE_SIZE cells and every cell keeps the
+blocks that touch it, in their original order. A point query only runs
+Block.containsPoint on the few blocks of the point's cell, so its cost does
+not grow with the number of blocks in the layout. Blocks are closed
+rectangles, so a block is also filed under the cells its right and bottom
+edges fall on.
+'''
+from engine.const import Const
+
+import math
+
+
+class BlockGrid(object):
+
+    def __init__(self, blocks, cellSize=None):
+        self.cellSize = cellSize if cellSize is not None else Const.BLOCK_TILE_SIZE
+        self.blocks = blocks
+        if not blocks:
+            self.minCol = self.minRow = 0
+            self.numCols = self.numRows = 0
+            self.cells = []
+            return
+        self.minCol = self.getCol(min(block.x1 for block in blocks))
+        self.minRow = self.getRow(min(block.y1 for block in blocks))
+        self.numCols = self.getCol(max(block.x2 for block in blocks)) - self.minCol + 1
+        self.numRows = self.getRow(max(block.y2 for block in blocks)) - self.minRow + 1
+        cells = [[] for _ in range(self.numRows * self.numCols)]
+        for block in blocks:
+            for row in range(self.getRow(block.y1), self.getRow(block.y2) + 1):
+                for col in range(self.getCol(block.x1), self.getCol(block.x2) + 1):
+                    cells[(row - self.minRow) * self.numCols + col - self.minCol].append(block)
+        # empty cells share None so lookups can skip them cheaply
+        self.cells = [tuple(cell) if cell else None for cell in cells]
+
+    def getCol(self, x):
+        return int(math.floor(x / self.cellSize))
+
+    def getRow(self, y):
+        return int(math.floor(y / self.cellSize))
+
+    # The blocks filed under the cell containing (x, y); a superset of the
+    # blocks containing the point.
+    def getCandidates(self, x, y):
+        col = self.getCol(x) - self.minCol
+        row = self.getRow(y) - self.minRow
+        if col < 0 or row < 0 or col >= self.numCols or row >= self.numRows:
+            return None
+        return self.cells[row * self.numCols + col]
+
+    # Function: Get Block
+    # ---------------------
+    # The first block (in the original order) containing (x, y), or None.
+    def getBlock(self, x, y):
+        candidates = self.getCandidates(x, y)
+        if candidates is None: return None
+        for block in candidates:
+            if block.containsPoint(x, y): return block
+        return None
+
+    def containsPoint(self, x, y):
+        return self.getBlock(x, y) is not None
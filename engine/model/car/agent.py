@@ -4,6 +4,7 @@ Created on Jun 11, 2013
 @author: chrispiech
 '''
 from engine.model.car.car import Car
+from engine.model.car.fleet import fleetVector, fleetScalar
 from engine.view.display import Display
 from engine.vector import Vec2d
 from none import NoInference
@@ -17,8 +18,17 @@ class Agent(Car):
     MAX_SPEED_STD = 2.0
     
     colorCounter = 0
+
+    # the physical state lives in the model's Fleet (see fleet.py)
+    pos = fleetVector('pos')
+    dir = fleetVector('dir')
+    velocity = fleetVector('velocity')
+    wheelAngle = fleetScalar('wheelAngle')
+    maxSpeed = fleetScalar('maxSpeed')
+    friction = fleetScalar('friction')
     
     def __init__(self, startNode, agentGraph, model, agentComm, parkBool):
+        model.getFleet().attach(self)
         self.agentGraph = agentGraph
         self.model = model
         self.agentComm = agentComm
@@ -49,14 +59,16 @@ class Agent(Car):
         if Const.CARS_PARKED: return
         return super(Agent, self).update()
 
+    # The fleet moves the car without going through update().
+    def getVersion(self):
+        return self.version + self.fleet.numUpdates
+
     def isCloseToOtherCar(self):
-        newBounds = []
-        offset = self.dir.normalized() * 1.5 * Car.LENGTH
-        for bound in self.getBounds():
-            bound += offset
-            newBounds.append(bound)
+        offset = self.getNormalDir() * 1.5 * Car.LENGTH
+        newBounds = [bound + offset for bound in self.getBounds()]
         newPos = self.pos + offset
-        for agent in self.agentComm.getAgents():
+        # only the StdCars near newPos can be within collides' reach
+        for agent in self.model.getSpatialHash().query(newPos.x, newPos.y, Car.RADIUS * 2):
             if agent.collides(newPos, newBounds): return True
         return False
 
@@ -69,7 +81,7 @@ class Agent(Car):
         #self.accelerate(Agent.ACCELERATION)
         #return
         
-        frontOfCar = self.pos + self.dir.normalized() * Car.LENGTH
+        frontOfCar = self.pos + self.getNormalDir() * Car.LENGTH
         if self.inIntersection:
             
             inter = self.model.getIntersection(frontOfCar.x, frontOfCar.y)
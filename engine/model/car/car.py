@@ -24,6 +24,10 @@ class Car(object):
     WIDTH = 10.0
 
     RADIUS = math.sqrt(LENGTH ** 2 + WIDTH ** 2)
+
+    # geometry cache statistics over all cars
+    numGeometryRequests = 0
+    numGeometryBuilds = 0
     
     def __init__(self, pos, dirName, velocity):
         self.initialPos = Vec2d(pos.x, pos.y)
@@ -35,6 +39,8 @@ class Car(object):
         self.maxSpeed = Car.MAX_SPEED
         self.friction = Car.FRICTION
         self.maxWheelAngle = Car.MAX_WHEEL_ANGLE
+        self.version = 0
+        self.geometryVersion = None
         
     def getPos(self):
         return self.pos
@@ -71,6 +77,11 @@ class Car(object):
         self.pos += self.velocity
         self.turnWheelsTowardsStraight()
         self.applyFriction()
+        self.version += 1
+
+    # Changes whenever pos or dir may have changed.
+    def getVersion(self):
+        return self.version
     
     def turnWheelsTowardsStraight(self):
         if self.wheelAngle < 0:
@@ -145,16 +156,40 @@ class Car(object):
             if not overlap: return False
         return True
             
-    def getBounds(self):
+    # Function: Update Geometry
+    # ---------------------
+    # The normalized direction and the bounds are computed once per version
+    # and shared by every reader until the car moves again.
+    def updateGeometry(self):
+        Car.numGeometryRequests += 1
+        version = self.getVersion()
+        if version == self.geometryVersion: return
+        Car.numGeometryBuilds += 1
         normalDir = self.dir.normalized()
         perpDir = normalDir.perpendicular()
-        bounds = [
+        self.normalDir = normalDir
+        self.bounds = [
             self.pos + normalDir * Car.LENGTH / 2 + perpDir * Car.WIDTH / 2,
             self.pos + normalDir * Car.LENGTH / 2 - perpDir * Car.WIDTH / 2,
             self.pos - normalDir * Car.LENGTH / 2 + perpDir * Car.WIDTH / 2,
             self.pos - normalDir * Car.LENGTH / 2 - perpDir * Car.WIDTH / 2
         ]
-        return bounds
+        self.geometryVersion = version
+
+    # The returned vector is shared, callers must not modify it.
+    def getNormalDir(self):
+        self.updateGeometry()
+        return self.normalDir
+
+    # The returned corners are shared, callers must not modify them.
+    def getBounds(self):
+        self.updateGeometry()
+        return self.bounds
+
+    @staticmethod
+    def getGeometryReuseRate():
+        if Car.numGeometryRequests == 0: return 0.0
+        return 1.0 - Car.numGeometryBuilds / Car.numGeometryRequests
             
     def dirFromName(self, dirName):
         if dirName == 'north': return Vec2d(0, -1)
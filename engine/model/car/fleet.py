@@ -0,0 +1,161 @@
+'''
+Struct-of-arrays state for the StdCars.
+
+Positions, directions, velocities, wheel angles, max speeds and friction of
+all agents live in flat per-field lists, and update() advances every car in
+one pass without allocating vectors. The Agent objects keep their usual
+interface: pos, dir and velocity are FleetVec views into the lists and the
+scalar fields are properties (see fleetVector and fleetScalar), so the
+per-car code in Car and Agent runs unchanged.
+
+update() reproduces Car.update() operation for operation, so batched and
+per-car stepping give bit-identical trajectories.
+'''
+from engine.vector import Vec2d
+
+import math
+
+
+class FleetVec(Vec2d):
+
+    __slots__ = ['xs', 'ys', 'index']
+
+    def __init__(self, xs, ys, index):
+        self.xs = xs
+        self.ys = ys
+        self.index = index
+
+    def getX(self):
+        return self.xs[self.index]
+
+    def setX(self, value):
+        self.xs[self.index] = value
+
+    def getY(self):
+        return self.ys[self.index]
+
+    def setY(self, value):
+        self.ys[self.index] = value
+
+    x = property(getX, setX)
+    y = property(getY, setY)
+
+
+class Fleet(object):
+
+    def __init__(self):
+        self.px = []
+        self.py = []
+        self.dx = []
+        self.dy = []
+        self.vx = []
+        self.vy = []
+        self.wheelAngle = []
+        self.maxSpeed = []
+        self.friction = []
+        self.numUpdates = 0
+
+    def getSize(self):
+        return len(self.px)
+
+    # Function: Attach
+    # ---------------------
+    # Gives car a slot in the fleet and the views its properties read from.
+    # Must be called before anything is assigned to the car's fleet fields.
+    def attach(self, car):
+        index = len(self.px)
+        for field in (self.px, self.py, self.dx, self.dy, self.vx, self.vy, self.wheelAngle):
+            field.append(0)
+        self.maxSpeed.append(0.0)
+        self.friction.append(0.0)
+        car.fleet = self
+        car.fleetIndex = index
+        car.posView = FleetVec(self.px, self.py, index)
+        car.dirView = FleetVec(self.dx, self.dy, index)
+        car.velocityView = FleetVec(self.vx, self.vy, index)
+        return index
+
+    # Function: Update
+    # ---------------------
+    # Car.update() for every car in the fleet: turnCarTowardsWheels, move,
+    # turnWheelsTowardsStraight and applyFriction.
+    def update(self):
+        px, py, dx, dy = self.px, self.py, self.dx, self.dy
+        vx, vy = self.vx, self.vy
+        wheelAngle, friction = self.wheelAngle, self.friction
+        sqrt, radians, cos, sin = math.sqrt, math.radians, math.cos, math.sin
+        atan2, degrees = math.atan2, math.degrees
+        for i in range(len(px)):
+            x, y = vx[i], vy[i]
+            # turnCarTowardsWheels
+            if sqrt(x**2 + y**2) > 0.0:
+                r = radians(wheelAngle[i])
+                c = cos(r)
+                s = sin(r)
+                x, y = x*c - y*s, x*s + y*c
+                dx[i] = x
+                dy[i] = y
+            # move
+            px[i] += x
+            py[i] += y
+            # turnWheelsTowardsStraight
+            w = wheelAngle[i]
+            if w < 0:
+                w += 0.7
+                if w > 0:
+                    w = 0.0
+            if w > 0:
+                w -= 0.7
+                if w < 0:
+                    w = 0.0
+            wheelAngle[i] = w
+            # applyFriction
+            if sqrt(x**2 + y**2) != 0:
+                fx, fy = -x, -y
+                length = sqrt(fx**2 + fy**2)
+                if length != 0:
+                    fx, fy = fx/length, fy/length
+                fx *= friction[i]
+                fy *= friction[i]
+                x += fx
+                y += fy
+                angle = degrees(atan2(x*fy - y*fx, x*fx + y*fy))
+                if abs(angle) < 180:
+                    x, y = 0, 0
+            vx[i] = x
+            vy[i] = y
+        # counted once every car has moved, so a reader that sees the new
+        # count also sees the new positions
+        self.numUpdates += 1
+
+
+# Function: Fleet Vector
+# ---------------------
+# Class-level property for a Vec2d field stored in the fleet. Reading returns
+# the car's live view; assigning copies the components in.
+def fleetVector(name):
+    viewName = name + 'View'
+
+    def getVector(car):
+        return getattr(car, viewName)
+
+    def setVector(car, value):
+        view = getattr(car, viewName)
+        if value is view: return
+        x, y = value[0], value[1]
+        view.x = x
+        view.y = y
+    return property(getVector, setVector)
+
+
+# Function: Fleet Scalar
+# ---------------------
+# Class-level property for a scalar field stored in the fleet.
+def fleetScalar(name):
+
+    def getScalar(car):
+        return getattr(car.fleet, name)[car.fleetIndex]
+
+    def setScalar(car, value):
+        getattr(car.fleet, name)[car.fleetIndex] = value
+    return property(getScalar, setScalar)
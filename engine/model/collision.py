@@ -0,0 +1,57 @@
+'''
+Batched oriented-box collision tests between cars.
+
+Cars are given as parallel lists of centres (xs, ys) and unit directions
+(dxs, dys); every box is Car.LENGTH long and Car.WIDTH wide. The test is the
+separating axis test of Car.collides written out on scalars: two boxes are
+apart if their centres are more than 2 * Car.RADIUS apart, or if the
+centre offset projected on one of the four box axes is larger than the sum
+of the boxes' half extents on that axis. Touching boxes collide, as in
+Car.collides.
+'''
+from engine.model.car.car import Car
+
+import math
+
+
+# Function: Normalize
+# ---------------------
+# Unit versions of the direction lists. Zero directions are left as they
+# are, like Vec2d.normalized().
+def normalize(dxs, dys):
+    uxs = []
+    uys = []
+    for dx, dy in zip(dxs, dys):
+        norm = math.sqrt(dx * dx + dy * dy)
+        if norm != 0:
+            dx, dy = dx / norm, dy / norm
+        uxs.append(dx)
+        uys.append(dy)
+    return uxs, uys
+
+
+# Function: Collides With
+# ---------------------
+# Query versus all: a list with, for every car i, whether the box at (x, y)
+# heading (dx, dy) overlaps car i. Directions must be unit vectors.
+def collidesWith(x, y, dx, dy, xs, ys, dxs, dys, length=Car.LENGTH, width=Car.WIDTH):
+    halfLength = length / 2
+    halfWidth = width / 2
+    reach = math.sqrt(length ** 2 + width ** 2) * 2
+    reach *= reach
+    mask = []
+    for ox, oy, bx, by in zip(xs, ys, dxs, dys):
+        tx = ox - x
+        ty = oy - y
+        if tx * tx + ty * ty > reach:
+            mask.append(False)
+            continue
+        cosAB = abs(dx * bx + dy * by)
+        sinAB = abs(dx * by - dy * bx)
+        alongLength = halfLength + halfLength * cosAB + halfWidth * sinAB
+        alongWidth = halfWidth + halfLength * sinAB + halfWidth * cosAB
+        mask.append(abs(tx * dx + ty * dy) <= alongLength and
+                    abs(ty * dx - tx * dy) <= alongWidth and
+                    abs(tx * bx + ty * by) <= alongLength and
+                    abs(ty * bx - tx * by) <= alongWidth)
+    return mask
@@ -6,8 +6,14 @@ import json
 
 class Layout(object):
 
-    def __init__(self, worldName):
-        self.loadData(worldName)
+    # data, if given, is used instead of layouts/<worldName>.json (e.g. for
+    # generated layouts).
+    def __init__(self, worldName, data=None):
+        self.worldName = worldName
+        if data is None:
+            self.loadData(worldName)
+        else:
+            self.data = data
         self.agentGraph = AgentGraph(self.data['agentGraph'])
         self.juniorGraph = AgentGraph(self.data['agentGraph'])
         self.juniorGraph.add(self.data['juniorGraph'])
@@ -21,6 +27,9 @@ class Layout(object):
         self.data = json.load(layoutFile)
         layoutFile.close()
         
+    def getWorldName(self):
+        return self.worldName
+
     def getAgentStart(self):
         return self.data['starts']
 
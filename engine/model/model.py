@@ -5,6 +5,9 @@ from .car.junior import Junior
 from engine.vector import Vec2d
 from autoDriver import AutoDriver
 from engine.model.block import Block
+from engine.model.blockGrid import BlockGrid
+from engine.model.car.fleet import Fleet
+from engine.model.spatialHash import SpatialHash
 from intelligentDriver import IntelligentDriver
 from engine.model.agentCommunication import AgentCommunication
 
@@ -48,6 +51,7 @@ class Model(object):
                 # print(block)
                 self.finish.append(Block(block))
 
+        self.fleet = Fleet()
         agentComm = AgentCommunication()
         agentGraph = layout.getAgentGraph()
         for _ in range(Const.NUM_AGENTS):
@@ -58,8 +62,13 @@ class Model(object):
             self.otherCars.append(other)
         self.observations = []
         agentComm.addAgents(self.otherCars)
+        self.spatialHash = SpatialHash()
+        self.spatialHash.rebuild(self.otherCars)
         self.modelLock = threading.Lock()
         self.probCarSet = False
+        self.beliefTick = 0
+        self.snapshotTick = -1
+        self.beliefSnapshot = None
         
         
     def _initBlocks(self, layout):
@@ -67,12 +76,14 @@ class Model(object):
         for blockData in layout.getBlockData():
             block = Block(blockData)
             self.blocks.append(block)
+        self.blockGrid = BlockGrid(self.blocks)
             
     def _initIntersections(self, layout):
         self.intersections = []
         for blockData in layout.getIntersectionNodes():
             block = Block(blockData)
             self.intersections.append(block)
+        self.intersectionGrid = BlockGrid(self.intersections)
             
     def _getStartNode(self, agentGraph):
         while True:
@@ -132,15 +143,25 @@ class Model(object):
             if not self.inBounds(point.x, point.y): return True
         
         # check for collision with other cars
-        for other in self.cars:
+        pos = car.getPos()
+        for other in self.getCarsNear(pos, Car.RADIUS * 2):
             if other == car: continue
-            if other.collides(car.getPos(), bounds): return True
+            if other.collides(pos, bounds): return True
         return False
+
+    # Function: Get Cars Near
+    # ---------------------
+    # A superset of the cars whose centre is within radius of pos: the StdCars
+    # from the spatial hash's cells around pos, and junior.
+    def getCarsNear(self, pos, radius):
+        return self.spatialHash.query(pos.x, pos.y, radius) + [self.junior]
+
+    # Must be called after the StdCars move.
+    def updateSpatialHash(self):
+        self.spatialHash.update(self.otherCars)
         
     def getIntersection(self, x, y):
-        for intersection in self.intersections:
-            if intersection.containsPoint(x, y): return intersection
-        return None
+        return self.intersectionGrid.getBlock(x, y)
         
     def inIntersection(self, x, y):
         return self.getIntersection(x, y) != None
@@ -148,9 +169,7 @@ class Model(object):
     def inBounds(self, x, y):
         if x < 0 or x >= self.getWidth(): return False
         if y < 0 or y >= self.getHeight(): return False
-        for block in self.blocks:
-            if block.containsPoint(x, y): return False
-        return True
+        return not self.blockGrid.containsPoint(x, y)
     
     def getWidth(self):
         return self.layout.getWidth()
@@ -175,6 +194,12 @@ class Model(object):
     
     def getOtherCars(self):
         return self.otherCars
+
+    def getFleet(self):
+        return self.fleet
+
+    def getSpatialHash(self):
+        return self.spatialHash
     
     def getJunior(self):
         return self.junior
@@ -190,6 +215,7 @@ class Model(object):
         self.currBeliefs = beliefs
 
         self.modelLock.acquire()
+        self.beliefTick += 1
         total = util.Belief(self.getBeliefRows(), self.getBeliefCols(), 0.0)
         for r in range(self.getBeliefRows()):
             for c in range(self.getBeliefCols()):
@@ -210,11 +236,19 @@ class Model(object):
         self.modelLock.release()
         return probCar
     
+    # The snapshot is copied once per estimator tick and shared by every
+    # caller until the next tick. Callers must treat it as read-only.
     def getProbCar(self):
         if not getattr(self,"currBeliefs", False):
             return None 
         self.modelLock.acquire()
-        probCar = copy.deepcopy(self.currBeliefs)
+        if self.snapshotTick != self.beliefTick:
+            self.beliefSnapshot = copy.deepcopy(self.currBeliefs)
+            self.snapshotTick = self.beliefTick
+        probCar = self.beliefSnapshot
         self.modelLock.release()
         return probCar
 
+    def getBeliefTick(self):
+        return self.beliefTick
+
@@ -0,0 +1,85 @@
+'''
+Uniform-grid spatial hash over car positions.
+
+Cells are Const.BELIEF_TILE_SIZE pixels wide. Each car is filed under the
+cell containing its centre, and update() only moves the cars whose cell
+changed since the last call. A query returns the cars in every cell that
+the square around the query point touches, so callers only run the exact
+(SAT) test on nearby cars.
+
+The controller thread moves the StdCars and then updates the hash, while
+the UI thread queries it for collisions without a lock. The square is
+therefore padded by one cell (a car moves less than a cell per tick, so it
+is at most one cell away from the one it is filed under), and update()
+files a car under its new cell before taking it out of the old one, so a
+query never misses a car that is in the middle of moving.
+'''
+from engine.const import Const
+
+import math
+
+
+class SpatialHash(object):
+
+    def __init__(self, cellSize=None):
+        self.cellSize = cellSize if cellSize is not None else Const.BELIEF_TILE_SIZE
+        self.cells = {}
+        self.carCells = {}
+        self.numQueries = 0
+        self.numCandidates = 0
+
+    def getCell(self, x, y):
+        return (int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize)))
+
+    def insert(self, car):
+        cell = self.getCell(car.pos.x, car.pos.y)
+        self.carCells[car] = cell
+        self.cells.setdefault(cell, []).append(car)
+
+    def remove(self, car):
+        cell = self.carCells.pop(car, None)
+        if cell is None: return
+        cars = self.cells[cell]
+        cars.remove(car)
+        if not cars: del self.cells[cell]
+
+    def rebuild(self, cars):
+        self.cells = {}
+        self.carCells = {}
+        for car in cars:
+            self.insert(car)
+
+    # Incremental update after the cars moved.
+    def update(self, cars):
+        for car in cars:
+            cell = self.getCell(car.pos.x, car.pos.y)
+            oldCell = self.carCells.get(car)
+            if oldCell != cell:
+                self.cells.setdefault(cell, []).append(car)
+                self.carCells[car] = cell
+                if oldCell is not None:
+                    cellCars = self.cells[oldCell]
+                    cellCars.remove(car)
+                    if not cellCars: del self.cells[oldCell]
+
+    # Function: Query
+    # ---------------------
+    # Every car whose centre may lie within radius of (x, y); a superset of
+    # the exact answer. The radius is padded by a cell, see above.
+    def query(self, x, y, radius):
+        self.numQueries += 1
+        radius += self.cellSize
+        minCol, minRow = self.getCell(x - radius, y - radius)
+        maxCol, maxRow = self.getCell(x + radius, y + radius)
+        found = []
+        cells = self.cells
+        for col in range(minCol, maxCol + 1):
+            for row in range(minRow, maxRow + 1):
+                cars = cells.get((col, row))
+                if cars: found.extend(cars)
+        self.numCandidates += len(found)
+        return found
+
+    def getMeanCandidates(self):
+        if self.numQueries == 0: return 0.0
+        return self.numCandidates / self.numQueries
@@ -0,0 +1,155 @@
+'''
+Anytime Repairing A* (ARA*) on the tile grid with a hard deadline.
+
+Each call to step() searches until the deadline and returns the best next
+tile known so far. While the start, the goal and the cost field stay the
+same, the open list and the inflation factor are carried over to the next
+call, so successive heartbeats keep improving the same plan instead of
+starting from scratch.
+'''
+from engine.const import Const
+from engine.planner import grid
+
+import heapq
+import itertools
+import time
+
+
+class AnytimePlanner(object):
+
+    # Checking the clock on every expansion costs more than the expansion.
+    CLOCK_INTERVAL = 16
+
+    def __init__(self, freeTiles, numRows, numCols):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.free = grid.buildFreeMask(freeTiles, numRows, numCols)
+        self.neighbours = grid.buildNeighbours(self.free, numRows, numCols)
+        self.epsilonStart = Const.ANYTIME_EPSILON_START
+        self.epsilonStep = Const.ANYTIME_EPSILON_STEP
+        self.start = None
+        self.goal = None
+        self.costs = None
+        self.numCalls = 0
+        self.numDeadlineHits = 0
+        self.numRestarts = 0
+        self.numSolutions = 0
+
+    # Function: Step
+    # ---------------------
+    # start and goal are (row, col) tiles, costs is a flat list with the cost
+    # of entering each tile. The same costs object must be passed as long as
+    # the cost field is unchanged; a new object restarts the search.
+    def step(self, start, goal, costs, deadline):
+        self.numCalls += 1
+        startIdx = start[0] * self.numCols + start[1]
+        goalIdx = goal[0] * self.numCols + goal[1]
+        if startIdx != self.start or goalIdx != self.goal or costs is not self.costs:
+            self.restart(startIdx, goalIdx, costs)
+
+        while not self.optimal:
+            if not self.improvePath(deadline):
+                self.numDeadlineHits += 1
+                break
+            self.publish()
+            if self.epsilon <= 1.0:
+                self.optimal = True
+                break
+            self.epsilon = max(1.0, self.epsilon - self.epsilonStep)
+            self.reopen()
+        return self.getNextTile()
+
+    def restart(self, startIdx, goalIdx, costs):
+        self.numRestarts += 1
+        self.start = startIdx
+        self.goal = goalIdx
+        self.costs = costs
+        self.epsilon = self.epsilonStart
+        self.optimal = False
+        self.counter = itertools.count()
+        self.g = {startIdx: 0.0}
+        self.parent = {startIdx: None}
+        self.closed = set()
+        self.incons = set()
+        self.openList = [(self.getKey(startIdx), next(self.counter), startIdx)]
+        self.solution = None
+        self.solutionEpsilon = None
+        self.bestIdx = startIdx
+        self.bestH = self.heuristic(startIdx)
+
+    def heuristic(self, idx):
+        return grid.manhattan(idx, self.goal, self.numCols)
+
+    def getKey(self, idx):
+        return self.g[idx] + self.epsilon * self.heuristic(idx)
+
+    # One ARA* ImprovePath pass for the current epsilon. Returns False if
+    # the deadline hit first; the open list is left as is for the next call.
+    def improvePath(self, deadline):
+        g = self.g
+        costs = self.costs
+        openList = self.openList
+        expanded = 0
+        while openList:
+            key, _, idx = openList[0]
+            if g.get(self.goal, float('inf')) <= key:
+                return True
+            heapq.heappop(openList)
+            if idx in self.closed or key > self.getKey(idx):
+                continue
+            self.closed.add(idx)
+            h = self.heuristic(idx)
+            if h < self.bestH:
+                self.bestIdx = idx
+                self.bestH = h
+            gIdx = g[idx]
+            for j in self.neighbours[idx]:
+                newG = gIdx + costs[j]
+                if newG < g.get(j, float('inf')):
+                    g[j] = newG
+                    self.parent[j] = idx
+                    if j in self.closed:
+                        self.incons.add(j)
+                    else:
+                        heapq.heappush(openList, (self.getKey(j), next(self.counter), j))
+            expanded += 1
+            if expanded % AnytimePlanner.CLOCK_INTERVAL == 0 and time.time() > deadline:
+                return False
+        return True
+
+    # Move the inconsistent states back to the open list under the new
+    # epsilon and forget the closed set, as in ARA*.
+    def reopen(self):
+        states = set(idx for _, _, idx in self.openList if idx not in self.closed)
+        states |= self.incons
+        self.openList = [(self.getKey(idx), next(self.counter), idx) for idx in states]
+        heapq.heapify(self.openList)
+        self.closed = set()
+        self.incons = set()
+
+    def publish(self):
+        if self.goal not in self.g: return
+        self.solution = self.getPathTo(self.goal)
+        self.solutionEpsilon = self.epsilon
+        self.numSolutions += 1
+
+    def getPathTo(self, idx):
+        path = []
+        while idx is not None:
+            path.append(idx)
+            idx = self.parent[idx]
+        path.reverse()
+        return path
+
+    # The second tile of the latest complete solution, or, before the first
+    # solution, of the path to the expanded tile closest to the goal.
+    def getNextTile(self):
+        path = self.solution
+        if path is None:
+            path = self.getPathTo(self.bestIdx)
+        idx = path[1] if len(path) > 1 else path[0]
+        return divmod(idx, self.numCols)
+
+    def getDeadlineHitRate(self):
+        if self.numCalls == 0: return 0.0
+        return self.numDeadlineHits / self.numCalls
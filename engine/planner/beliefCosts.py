@@ -0,0 +1,90 @@
+'''
+Belief costs of single tiles, computed when a planner first asks for them.
+
+IntelligentDriver.modifyWorldGraph blurs every belief over the whole grid
+(a moving car also spreads into the ring around its tile, a parked one into
+the 5x5 square) and normalises the sum. The blur is a fixed kernel, so the
+likelihood of one tile only needs the beliefs of the 5x5 square around it,
+and the normalising total only needs each car's belief mass and the few
+tiles near the border where the kernel is clipped. The hierarchical
+planner only looks at the tiles of the roads it searches and of the next
+segment, so it pays for those tiles instead of the whole map.
+'''
+
+
+# Function: Get Kernel
+# ---------------------
+# (dRow, dCol, weight) of the blur around a car's tile, with the same
+# weights as IntelligentDriver.modifyWorldGraph (the tile itself also keeps
+# its own probability).
+def getKernel(parked):
+    kernel = []
+    for dRow in range(-2, 3):
+        for dCol in range(-2, 3):
+            if parked:
+                weight = 1 / 5 if abs(dRow) == 2 or abs(dCol) == 2 else 1 / 2
+            else:
+                weight = 1 / 5 if abs(dRow) == 1 or abs(dCol) == 1 or (dRow == 0 and dCol == 0) else 0
+            if dRow == 0 and dCol == 0: weight += 1
+            if weight: kernel.append((dRow, dCol, weight))
+    return kernel
+
+
+KERNELS = {False: getKernel(False), True: getKernel(True)}
+
+
+class BeliefCosts(object):
+
+    # Indexed like the flat row-major tileCosts of HierarchicalPlanner:
+    # beliefCosts[idx] == costFactor * likelihood of tile idx.
+    def __init__(self, beliefs, parkedCars, numRows, numCols, costFactor):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.costFactor = costFactor
+        self.grids = [belief.grid for belief in beliefs]
+        self.kernels = [KERNELS[bool(parked)] for parked in parkedCars]
+        self.total = self.getTotal()
+        self.likelihoods = {}
+
+    def __getitem__(self, idx):
+        return self.costFactor * self.getLikelihood(idx)
+
+    # Sum of the blurred likelihood over the grid: every car spreads the
+    # kernel's weight times its mass, less what the border clips.
+    def getTotal(self):
+        total = 0
+        borderTiles = self.getBorderTiles()
+        for grid, kernel in zip(self.grids, self.kernels):
+            total += sum(weight for _, _, weight in kernel) * sum(map(sum, grid))
+            for (row, col) in borderTiles:
+                p = grid[row][col]
+                if not p: continue
+                total -= p * sum(weight for dRow, dCol, weight in kernel
+                                 if not self.inGrid(row + dRow, col + dCol))
+        return total
+
+    # Tiles within two of the border, the only ones whose blur is clipped.
+    def getBorderTiles(self):
+        rows = set(range(min(2, self.numRows))) | set(range(max(self.numRows - 2, 0), self.numRows))
+        cols = set(range(min(2, self.numCols))) | set(range(max(self.numCols - 2, 0), self.numCols))
+        tiles = set((row, col) for row in rows for col in range(self.numCols))
+        tiles.update((row, col) for row in range(self.numRows) for col in cols)
+        return tiles
+
+    def inGrid(self, row, col):
+        return 0 <= row < self.numRows and 0 <= col < self.numCols
+
+    # The normalised likelihood of tile idx, as in modifyWorldGraph.
+    def getLikelihood(self, idx):
+        likelihood = self.likelihoods.get(idx)
+        if likelihood is not None: return likelihood
+        row, col = divmod(idx, self.numCols)
+        likelihood = 0
+        for grid, kernel in zip(self.grids, self.kernels):
+            for dRow, dCol, weight in kernel:
+                r, c = row - dRow, col - dCol
+                if 0 <= r < self.numRows and 0 <= c < self.numCols:
+                    likelihood += weight * grid[r][c]
+        likelihood /= self.total
+        self.likelihoods[idx] = likelihood
+        return likelihood
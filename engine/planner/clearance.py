@@ -0,0 +1,115 @@
+'''
+Clearance map: Euclidean distance from every belief tile to the nearest
+obstacle, in tiles.
+
+Blocks and everything outside the grid count as obstacles, so a tile next
+to a block or on the border of the world has clearance 1. The distance
+transform (Felzenszwalb & Huttenlocher, exact for squared distances) runs
+once when the layout is loaded; afterwards clearance, its gradient and the
+clearance cost of a tile are list lookups.
+'''
+from engine.const import Const
+
+import math
+
+
+# Lower envelope of parabolas rooted at (q, f[q]): the 1D squared distance
+# transform of f.
+def distanceTransform1d(f):
+    n = len(f)
+    inf = float('inf')
+    d = [inf] * n
+    v = [0] * n
+    z = [0.0] * (n + 1)
+    k = -1
+    for q in range(n):
+        if f[q] == inf: continue
+        while k >= 0:
+            s = ((f[q] + q * q) - (f[v[k]] + v[k] * v[k])) / (2.0 * (q - v[k]))
+            if s > z[k]: break
+            k -= 1
+        k += 1
+        v[k] = q
+        z[k] = -inf if k == 0 else s
+        z[k + 1] = inf
+    if k < 0: return d
+    j = 0
+    for q in range(n):
+        while z[j + 1] < q:
+            j += 1
+        d[q] = (q - v[j]) ** 2 + f[v[j]]
+    return d
+
+
+class ClearanceMap(object):
+
+    # obstacleMask is row-major with a nonzero entry for every obstacle tile
+    # (e.g. TileMap.getMask(TileMap.OBSTACLE)). With compiled (the layout's
+    # CompiledLayout) the clearance is read instead of computed.
+    def __init__(self, obstacleMask, numRows, numCols, compiled=None):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.wallDist = Const.CLEARANCE_WALL_DIST
+        self.safeDist = Const.CLEARANCE_SAFE_DIST
+        self.costWeight = Const.CLEARANCE_COST_WEIGHT
+        if compiled is not None:
+            self.clearance = list(compiled.getArray('clearance'))
+        else:
+            self.clearance = self.computeClearance(obstacleMask)
+        self.costs = [self.costWeight * max(0.0, self.safeDist - c) if c > 0 else 0.0
+                      for c in self.clearance]
+
+    # Runs the transform on the grid surrounded by a ring of obstacle tiles,
+    # which stands in for the world border.
+    def computeClearance(self, obstacleMask):
+        numRows, numCols = self.numRows, self.numCols
+        rows, cols = numRows + 2, numCols + 2
+        inf = float('inf')
+        sqDist = [[0.0] * cols]
+        for r in range(numRows):
+            row = [0.0]
+            for c in range(numCols):
+                row.append(0.0 if obstacleMask[r * numCols + c] else inf)
+            row.append(0.0)
+            sqDist.append(row)
+        sqDist.append([0.0] * cols)
+
+        columns = [distanceTransform1d([sqDist[r][c] for r in range(rows)]) for c in range(cols)]
+        clearance = []
+        for r in range(1, numRows + 1):
+            row = distanceTransform1d([columns[c][r] for c in range(cols)])
+            clearance.extend(math.sqrt(d) for d in row[1:numCols + 1])
+        return clearance
+
+    def inGrid(self, tile):
+        return 0 <= tile[0] < self.numRows and 0 <= tile[1] < self.numCols
+
+    # Tiles outside the grid and obstacle tiles have clearance 0.
+    def getClearance(self, tile):
+        if not self.inGrid(tile): return 0.0
+        return self.clearance[tile[0] * self.numCols + tile[1]]
+
+    def getClearances(self):
+        return self.clearance
+
+    # Central difference of the clearance, as (dRow, dCol). Points away from
+    # the nearest obstacles; zero in the middle of a corridor.
+    def getGradient(self, tile):
+        (row, col) = tile
+        dRow = (self.getClearance((row + 1, col)) - self.getClearance((row - 1, col))) / 2.0
+        dCol = (self.getClearance((row, col + 1)) - self.getClearance((row, col - 1))) / 2.0
+        return (dRow, dCol)
+
+    # True for free tiles within Const.CLEARANCE_WALL_DIST of an obstacle.
+    def isNearWall(self, tile):
+        clearance = self.getClearance(tile)
+        return 0 < clearance <= self.wallDist
+
+    # Extra cost of entering a tile: grows linearly as the clearance drops
+    # below Const.CLEARANCE_SAFE_DIST.
+    def getCost(self, tile):
+        if not self.inGrid(tile): return 0.0
+        return self.costs[tile[0] * self.numCols + tile[1]]
+
+    def getCosts(self):
+        return self.costs
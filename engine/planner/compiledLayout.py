@@ -0,0 +1,214 @@
+'''
+Compiled layouts: the static tables the planners derive from a layout,
+computed once and stored in binary files per layout.
+
+A compiled layout comes in sections, each compiled into its own file the
+first time it is loaded. The 'tiles' section, used by every planner, holds
+the tile flags (obstacles and checkpoints), the clearance of every tile and
+the 4-neighbour graph of the free tiles in compressed sparse rows. The
+'hierarchical' section holds the hierarchical planner's road nodes, road
+paths and static distance tables (and the neighbour graph again), which are
+the slow part to compute on large maps; only runs with that planner compile
+it. Files live in Const.LAYOUT_CACHE_DIR under a hash of the section, the
+layout data and the constants they depend on, so editing a layout or the
+tile size compiles a new one.
+
+File layout: MAGIC, the length of the JSON header as a little-endian
+uint32, the header (key, and the name, type code, offset and size of every
+array), then the raw bytes of every array, each aligned to 8 bytes. Files
+are memory-mapped and the arrays are read through typed memoryviews, so
+loading a compiled layout does not read the distance tables until they are
+used.
+'''
+from engine.const import Const
+from engine.planner import grid
+
+import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+
+MAGIC = b'DCLAYOUT'
+VERSION = 3
+ALIGNMENT = 8
+
+# compiled layouts loaded by this process, by key
+loaded = {}
+
+
+class CompiledLayout(object):
+
+    # buffer is the whole file (bytes or an mmap).
+    def __init__(self, header, buffer, dataStart):
+        self.header = header
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.arrays = {}
+        for name, typecode, offset, size in header['arrays']:
+            start = dataStart + offset
+            self.arrays[name] = self.view[start:start + size].cast(typecode)
+
+    def getKey(self):
+        return self.header['key']
+
+    def has(self, name):
+        return name in self.arrays
+
+    # A read-only 1D memoryview.
+    def getArray(self, name):
+        return self.arrays[name]
+
+    # The array as a list of row views of rowLength items.
+    def getRows(self, name, rowLength):
+        values = self.arrays[name]
+        return [values[i:i + rowLength] for i in range(0, len(values), rowLength)]
+
+
+def getCacheKey(layout, section):
+    content = json.dumps({
+        'version': VERSION,
+        'section': section,
+        'layout': layout.data,
+        'blockTileSize': Const.BLOCK_TILE_SIZE,
+        'beliefTileSize': Const.BELIEF_TILE_SIZE,
+        'byteorder': sys.byteorder,
+    }, sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def getCachePath(key):
+    return os.path.join(Const.LAYOUT_CACHE_DIR, key + '.layout')
+
+
+# The arrays of a section, as (name, typecode, values), computed by the
+# planners' own set-up code.
+def getTileArrays(layout):
+    from engine.planner.clearance import ClearanceMap
+    from engine.planner.tileMap import TileMap
+
+    numRows = layout.getBeliefRows()
+    numCols = layout.getBeliefCols()
+    tileMap = TileMap(layout)
+    clearanceMap = ClearanceMap(tileMap.getMask(TileMap.OBSTACLE), numRows, numCols)
+    return [
+        ('tileFlags', 'B', tileMap.flags),
+        ('clearance', 'd', clearanceMap.getClearances()),
+    ] + getNeighbourArrays(tileMap, numRows, numCols)
+
+
+def getHierarchicalArrays(layout):
+    from engine.planner.hierarchical import HierarchicalPlanner
+    from engine.planner.tileMap import TileMap
+
+    numRows = layout.getBeliefRows()
+    numCols = layout.getBeliefCols()
+    tileMap = TileMap(layout)
+    hierarchical = HierarchicalPlanner(layout.getJuniorGraph(), tileMap.getFreeTiles(), numRows, numCols)
+    return getNeighbourArrays(tileMap, numRows, numCols) + hierarchical.getCompiledArrays()
+
+
+def getNeighbourArrays(tileMap, numRows, numCols):
+    neighbourOffsets, neighbourTargets = grid.toCSR(grid.buildNeighbours(tileMap.getFreeMask(), numRows, numCols))
+    return [
+        ('neighbourOffsets', 'i', neighbourOffsets),
+        ('neighbourTargets', 'i', neighbourTargets),
+    ]
+
+
+SECTIONS = {
+    'tiles': getTileArrays,
+    'hierarchical': getHierarchicalArrays,
+}
+
+
+# Function: Compile Layout
+# ---------------------
+# Returns the file contents of one section of the layout's compiled layout.
+def compileLayout(layout, key, section):
+    arrays = SECTIONS[section](layout)
+
+    header = {'key': key, 'arrays': []}
+    chunks = []
+    offset = 0
+    for name, typecode, values in arrays:
+        data = array.array(typecode, values).tobytes()
+        padding = -len(data) % ALIGNMENT
+        header['arrays'].append([name, typecode, offset, len(data)])
+        chunks.append(data + bytes(padding))
+        offset += len(data) + padding
+    return packFile(header, b''.join(chunks))
+
+
+def packFile(header, data):
+    headerBytes = json.dumps(header).encode('utf-8')
+    start = len(MAGIC) + 4 + len(headerBytes)
+    padding = -start % ALIGNMENT
+    return MAGIC + struct.pack('<I', len(headerBytes)) + headerBytes + bytes(padding) + data
+
+
+# Returns (header, start of the data) or None if buffer is not a compiled
+# layout with the given key.
+def unpackHeader(buffer, key):
+    if len(buffer) < len(MAGIC) + 4 or buffer[:len(MAGIC)] != MAGIC: return None
+    (headerLength,) = struct.unpack_from('<I', buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + headerLength]).decode('utf-8'))
+    if header.get('key') != key: return None
+    dataStart = start + headerLength
+    dataStart += -dataStart % ALIGNMENT
+    for _, typecode, offset, size in header['arrays']:
+        if size % array.array(typecode).itemsize != 0 or dataStart + offset + size > len(buffer):
+            return None
+    return header, dataStart
+
+
+def readCompiledLayout(path, key):
+    with open(path, 'rb') as layoutFile:
+        buffer = mmap.mmap(layoutFile.fileno(), 0, access=mmap.ACCESS_READ)
+    unpacked = unpackHeader(buffer, key)
+    if unpacked is None:
+        buffer.close()
+        return None
+    return CompiledLayout(unpacked[0], buffer, unpacked[1])
+
+
+# The file is written next to its final path and renamed, so concurrent
+# runs (e.g. batchRunner.py workers) never read a partial file. The cache
+# is only an optimisation, so failing to write it is not an error.
+def writeCompiledLayout(path, contents):
+    tempPath = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        if not os.path.isdir(Const.LAYOUT_CACHE_DIR):
+            os.makedirs(Const.LAYOUT_CACHE_DIR)
+        with open(tempPath, 'wb') as layoutFile:
+            layoutFile.write(contents)
+        os.replace(tempPath, path)
+    except OSError:
+        if os.path.exists(tempPath): os.remove(tempPath)
+
+
+# Function: Load
+# ---------------------
+# One section (see SECTIONS) of the compiled layout of layout: from this
+# process, from the cache directory, or compiled now (and cached).
+def load(layout, section='tiles'):
+    key = getCacheKey(layout, section)
+    if key in loaded: return loaded[key]
+    path = getCachePath(key)
+    compiled = None
+    if os.path.exists(path):
+        try:
+            compiled = readCompiledLayout(path, key)
+        except (OSError, ValueError):
+            compiled = None
+    if compiled is None:
+        contents = compileLayout(layout, key, section)
+        writeCompiledLayout(path, contents)
+        header, dataStart = unpackHeader(contents, key)
+        compiled = CompiledLayout(header, contents, dataStart)
+    loaded[key] = compiled
+    return compiled
@@ -0,0 +1,132 @@
+'''
+Occupancy forecasts for the planner.
+
+The transition dictionary returned by util.loadTransProb() is compiled once
+into a sparse row-major table so that pushing a belief forward in time is a
+sparse mat-vec instead of particle resampling. Forecasts are computed at most
+once per estimator tick and handed out as read-only tuples.
+'''
+from engine.const import Const
+
+
+class TransitionModel(object):
+
+    def __init__(self, transProb, numRows, numCols):
+        self.numRows = numRows
+        self.numCols = numCols
+        numTiles = numRows * numCols
+        # successors[i] is a tuple of (j, p) pairs with p > 0. Tiles without
+        # any outgoing mass keep it where it is.
+        successors = [[] for _ in range(numTiles)]
+        for ((r1, c1), (r2, c2)), p in transProb.items():
+            if p <= 0: continue
+            if not self.inGrid(r1, c1) or not self.inGrid(r2, c2): continue
+            successors[r1 * numCols + c1].append((r2 * numCols + c2, p))
+        self.successors = []
+        for i in range(numTiles):
+            row = successors[i]
+            total = sum(p for _, p in row)
+            if total == 0:
+                self.successors.append(((i, 1.0),))
+            else:
+                self.successors.append(tuple((j, p / total) for j, p in row))
+
+    def inGrid(self, row, col):
+        return 0 <= row < self.numRows and 0 <= col < self.numCols
+
+    def getNumTiles(self):
+        return self.numRows * self.numCols
+
+    # One step of the chain: out[j] = sum_i vec[i] * T[i][j]. Zero entries
+    # of vec are skipped, which is what keeps this cheap for peaked beliefs.
+    def step(self, vec):
+        out = [0.0] * len(vec)
+        successors = self.successors
+        for i, p in enumerate(vec):
+            if p == 0.0: continue
+            for j, t in successors[i]:
+                out[j] += p * t
+        return out
+
+
+class Forecast(object):
+
+    def __init__(self, numRows, numCols, carGrids, occupancy):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.carGrids = carGrids
+        self.occupancy = occupancy
+        self.horizon = len(occupancy) - 1
+
+    def getHorizon(self):
+        return self.horizon
+
+    def getNumCars(self):
+        return len(self.carGrids)
+
+    # Flat, row-major tuple with the probability of car carIdx being in
+    # each tile h steps from now (h = 0 is the current belief).
+    def getCarGrid(self, carIdx, h):
+        return self.carGrids[carIdx][min(h, self.horizon)]
+
+    # Flat, row-major tuple with the probability that *any* car occupies
+    # each tile h steps from now.
+    def getOccupancy(self, h):
+        return self.occupancy[min(h, self.horizon)]
+
+    def getProb(self, h, row, col):
+        return self.getOccupancy(h)[row * self.numCols + col]
+
+    def getCarProb(self, carIdx, h, row, col):
+        return self.getCarGrid(carIdx, h)[row * self.numCols + col]
+
+
+class OccupancyForecaster(object):
+
+    def __init__(self, transModel, horizon=None):
+        self.transModel = transModel
+        self.horizon = horizon if horizon is not None else Const.FORECAST_HORIZON
+        self.cachedBeliefs = None
+        self.cachedParked = None
+        self.cachedForecast = None
+        self.numComputed = 0
+        self.numRequests = 0
+
+    # Model.getProbCar hands out one snapshot per estimator tick, so the
+    # snapshot object itself is the cache key. A reference to it is kept so
+    # that its id can never be reused while it is cached.
+    def forecast(self, beliefs, parkedCars):
+        self.numRequests += 1
+        parked = tuple(parkedCars)
+        if beliefs is self.cachedBeliefs and parked == self.cachedParked:
+            return self.cachedForecast
+        forecast = self.compute(beliefs, parked)
+        self.cachedBeliefs = beliefs
+        self.cachedParked = parked
+        self.cachedForecast = forecast
+        self.numComputed += 1
+        return forecast
+
+    def compute(self, beliefs, parkedCars):
+        numRows = self.transModel.numRows
+        numCols = self.transModel.numCols
+        carGrids = []
+        for carIdx, belief in enumerate(beliefs):
+            vec = [p for row in belief.grid for p in row]
+            grids = [tuple(vec)]
+            for _ in range(self.horizon):
+                if not parkedCars[carIdx]:
+                    vec = self.transModel.step(vec)
+                grids.append(tuple(vec))
+            carGrids.append(tuple(grids))
+
+        occupancy = []
+        for h in range(self.horizon + 1):
+            pNot = [1.0] * (numRows * numCols)
+            for grids in carGrids:
+                grid = grids[h]
+                for i, p in enumerate(grid):
+                    if p != 0.0:
+                        pNot[i] *= 1.0 - p
+            occupancy.append(tuple(1.0 - q for q in pNot))
+        return Forecast(numRows, numCols, tuple(carGrids), tuple(occupancy))
@@ -0,0 +1,110 @@
+'''
+Flat row-major helpers shared by the tile planners. Tile (row, col) is
+stored at index row * numCols + col.
+'''
+import array
+
+MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+
+def buildFreeMask(freeTiles, numRows, numCols):
+    free = bytearray(numRows * numCols)
+    for (row, col) in freeTiles:
+        free[row * numCols + col] = 1
+    return free
+
+
+# For every tile (free or not) the tuple of free 4-neighbours.
+def buildNeighbours(free, numRows, numCols):
+    neighbours = []
+    for row in range(numRows):
+        for col in range(numCols):
+            adj = []
+            for dr, dc in MOVES:
+                r, c = row + dr, col + dc
+                if 0 <= r < numRows and 0 <= c < numCols:
+                    j = r * numCols + c
+                    if free[j]: adj.append(j)
+            neighbours.append(tuple(adj))
+    return neighbours
+
+
+def manhattan(idx, goalIdx, numCols):
+    row, col = divmod(idx, numCols)
+    goalRow, goalCol = divmod(goalIdx, numCols)
+    return abs(row - goalRow) + abs(col - goalCol)
+
+
+# Unit-cost BFS distances from sourceIdx to every tile (inf if unreachable).
+def bfsDistances(neighbours, sourceIdx):
+    inf = float('inf')
+    dists = [inf] * len(neighbours)
+    dists[sourceIdx] = 0
+    frontier = [sourceIdx]
+    while frontier:
+        nextFrontier = []
+        for i in frontier:
+            d = dists[i] + 1
+            for j in neighbours[i]:
+                if d < dists[j]:
+                    dists[j] = d
+                    nextFrontier.append(j)
+        frontier = nextFrontier
+    return dists
+
+
+# Unit-cost BFS distances from sourceIdx, as a dict, to the tiles no farther
+# than the farthest of targetIdxs (the whole component if one of them is
+# unreachable).
+def bfsDistancesWithin(neighbours, sourceIdx, targetIdxs):
+    dists = {sourceIdx: 0}
+    remaining = set(targetIdxs)
+    remaining.discard(sourceIdx)
+    frontier = [sourceIdx]
+    d = 0
+    while frontier and remaining:
+        d += 1
+        nextFrontier = []
+        for i in frontier:
+            for j in neighbours[i]:
+                if j not in dists:
+                    dists[j] = d
+                    nextFrontier.append(j)
+                    remaining.discard(j)
+        frontier = nextFrontier
+    return dists
+
+
+# Unit-cost BFS distances from sourceIdx, as a dict, to the tiles at most
+# maxDist away.
+def bfsDistancesUpTo(neighbours, sourceIdx, maxDist):
+    dists = {sourceIdx: 0}
+    frontier = [sourceIdx]
+    d = 0
+    while frontier and d < maxDist:
+        d += 1
+        nextFrontier = []
+        for i in frontier:
+            for j in neighbours[i]:
+                if j not in dists:
+                    dists[j] = d
+                    nextFrontier.append(j)
+        frontier = nextFrontier
+    return dists
+
+
+# Function: To CSR
+# ---------------------
+# Compressed sparse rows of a neighbours list: the neighbours of tile i are
+# targets[offsets[i]:offsets[i + 1]].
+def toCSR(neighbours):
+    offsets = array.array('i', [0])
+    targets = array.array('i')
+    for adj in neighbours:
+        targets.extend(adj)
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def fromCSR(offsets, targets):
+    return [tuple(targets[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
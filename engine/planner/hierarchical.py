@@ -0,0 +1,287 @@
+'''
+Two-level planning on top of the layout's road graph.
+
+The coarse layer is the junior graph (Layout.getJuniorGraph()): its nodes
+are mapped to belief tiles and every road edge is weighted by the static
+grid distance between its ends. The grid distances of a road node are only
+computed out to its farthest road neighbour, which covers its roads and
+keeps the tables proportional to the road network instead of the map.
+All-pairs distances are computed once with Floyd-Warshall. At run time the
+road graph is searched with the current belief costs along each road (A*
+with the static all-pairs distances as the heuristic), entered at the road
+nodes within one road length of the AutoCar, and only the next road
+segment, from the AutoCar to the next waypoint, is searched on the tile
+grid.
+
+The AutoCar is not bound to lanes, so road edges are used in both
+directions.
+'''
+from engine.const import Const
+from engine.planner import grid
+
+import heapq
+import util
+
+
+class HierarchicalPlanner(object):
+
+    # compiled, if given, is the 'hierarchical' section of the layout's
+    # compiled layout (see engine/planner/compiledLayout.py), which holds
+    # everything computed here.
+    def __init__(self, roadGraph, freeTiles, numRows, numCols, compiled=None):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.free = grid.buildFreeMask(freeTiles, numRows, numCols)
+        self.segmentTiles = Const.HIERARCHICAL_SEGMENT_TILES
+        self.reachedTiles = Const.HIERARCHICAL_REACHED_TILES
+        if compiled is not None:
+            self.loadCompiled(compiled)
+        else:
+            self.neighbours = grid.buildNeighbours(self.free, numRows, numCols)
+            self.loadRoadNodes(roadGraph)
+            # static grid distances from every road node, by tile, out to its
+            # farthest road neighbour
+            self.nodeDists = [grid.bfsDistancesWithin(self.neighbours, idx, targets)
+                              for idx, targets in zip(self.nodeTiles, self.getRoadTargets(roadGraph))]
+            self.loadRoadEdges(roadGraph)
+            self.computeAllPairs()
+        self.tileNodes = {idx: u for u, idx in enumerate(self.nodeTiles)}
+        # the length of the longest road
+        self.entryDist = max([len(tiles) for roads in self.roads for _, tiles in roads] + [0])
+        self.goalDists = {}
+        self.goalHeuristics = {}
+        self.numPlans = 0
+        self.numDirect = 0
+
+    # Road nodes whose tile is blocked (or off the grid) are dropped; nodes
+    # sharing a tile are merged.
+    def loadRoadNodes(self, roadGraph):
+        self.nodeTiles = []
+        self.nodeIndex = {}
+        tileIndex = {}
+        for nodeId in sorted(roadGraph.nodeMap):
+            pos = roadGraph.getNode(nodeId).getPos()
+            row = min(max(util.yToRow(pos.y), 0), self.numRows - 1)
+            col = min(max(util.xToCol(pos.x), 0), self.numCols - 1)
+            idx = row * self.numCols + col
+            if not self.free[idx]: continue
+            if idx not in tileIndex:
+                tileIndex[idx] = len(self.nodeTiles)
+                self.nodeTiles.append(idx)
+            self.nodeIndex[nodeId] = tileIndex[idx]
+
+    # The tiles of the road neighbours of every road node.
+    def getRoadTargets(self, roadGraph):
+        targets = [set() for _ in self.nodeTiles]
+        for nodeId, nextIds in roadGraph.pathGraph.items():
+            if nodeId not in self.nodeIndex: continue
+            for nextId in nextIds:
+                if nextId in self.nodeIndex:
+                    targets[self.nodeIndex[nodeId]].add(self.nodeTiles[self.nodeIndex[nextId]])
+        return targets
+
+    def loadRoadEdges(self, roadGraph):
+        n = len(self.nodeTiles)
+        inf = float('inf')
+        self.dist = [[inf] * n for _ in range(n)]
+        # roads[u] lists (v, tiles of the static path from u to v, u excluded)
+        self.roads = [[] for _ in range(n)]
+        for u in range(n):
+            self.dist[u][u] = 0
+        for nodeId, nextIds in roadGraph.pathGraph.items():
+            if nodeId not in self.nodeIndex: continue
+            u = self.nodeIndex[nodeId]
+            for nextId in nextIds:
+                if nextId not in self.nodeIndex: continue
+                v = self.nodeIndex[nextId]
+                if u == v: continue
+                d = self.nodeDists[u].get(self.nodeTiles[v], inf)
+                if d == inf or self.dist[u][v] == d: continue
+                self.dist[u][v] = self.dist[v][u] = d
+                tiles = self.getStaticPath(u, self.nodeTiles[v])
+                self.roads[u].append((v, tiles))
+                self.roads[v].append((u, [self.nodeTiles[u]] + tiles[-2::-1]))
+
+    # Walks down the BFS distances of road node u, from idx back to u.
+    # Returns the tiles from u (excluded) to idx (included).
+    def getStaticPath(self, u, idx):
+        dists = self.nodeDists[u]
+        inf = float('inf')
+        path = [idx]
+        while dists[idx] > 1:
+            idx = min(self.neighbours[idx], key=lambda j: dists.get(j, inf))
+            path.append(idx)
+        path.reverse()
+        return path
+
+    # Floyd-Warshall.
+    def computeAllPairs(self):
+        n = len(self.nodeTiles)
+        dist = self.dist
+        for k in range(n):
+            distK = dist[k]
+            for i in range(n):
+                distIK = dist[i][k]
+                if distIK == float('inf'): continue
+                distI = dist[i]
+                for j in range(n):
+                    d = distIK + distK[j]
+                    if d < distI[j]:
+                        distI[j] = d
+
+    # Function: Get Compiled Arrays
+    # ---------------------
+    # The road nodes, static distances and roads as (name, typecode, values)
+    # for CompiledLayout. The distances of road node u are for the tiles
+    # roadNodeDistTiles[roadNodeDistOffsets[u]:roadNodeDistOffsets[u + 1]].
+    # Distances are whole numbers of tiles (or inf), so single precision
+    # holds the tile distances exactly.
+    def getCompiledArrays(self):
+        nodeIds = sorted(self.nodeIndex)
+        roadOffsets, roadTargets = grid.toCSR([[v for v, _ in roads] for roads in self.roads])
+        tileOffsets, roadTiles = grid.toCSR([tiles for roads in self.roads for _, tiles in roads])
+        distOffsets, distTiles = grid.toCSR([sorted(dists) for dists in self.nodeDists])
+        return [
+            ('roadNodeTiles', 'i', self.nodeTiles),
+            ('roadNodeIds', 'i', nodeIds),
+            ('roadNodeSlots', 'i', [self.nodeIndex[nodeId] for nodeId in nodeIds]),
+            ('roadNodeDistOffsets', 'i', distOffsets),
+            ('roadNodeDistTiles', 'i', distTiles),
+            ('roadNodeDists', 'f', [dists[idx] for dists in self.nodeDists for idx in sorted(dists)]),
+            ('roadDist', 'd', [d for dists in self.dist for d in dists]),
+            ('roadOffsets', 'i', roadOffsets),
+            ('roadTargets', 'i', roadTargets),
+            ('roadTileOffsets', 'i', tileOffsets),
+            ('roadTiles', 'i', roadTiles),
+        ]
+
+    # The all-pairs distances stay a view into the compiled layout; the
+    # neighbours, the node distances and the roads are turned into lists
+    # and dicts.
+    def loadCompiled(self, compiled):
+        self.neighbours = grid.fromCSR(compiled.getArray('neighbourOffsets'), compiled.getArray('neighbourTargets'))
+        self.nodeTiles = list(compiled.getArray('roadNodeTiles'))
+        self.nodeIndex = dict(zip(compiled.getArray('roadNodeIds'), compiled.getArray('roadNodeSlots')))
+        distOffsets = compiled.getArray('roadNodeDistOffsets')
+        distTiles = compiled.getArray('roadNodeDistTiles')
+        dists = compiled.getArray('roadNodeDists')
+        self.nodeDists = [dict(zip(distTiles[distOffsets[u]:distOffsets[u + 1]], dists[distOffsets[u]:distOffsets[u + 1]]))
+                          for u in range(len(self.nodeTiles))]
+        self.dist = compiled.getRows('roadDist', len(self.nodeTiles))
+        targets = grid.fromCSR(compiled.getArray('roadOffsets'), compiled.getArray('roadTargets'))
+        tiles = grid.fromCSR(compiled.getArray('roadTileOffsets'), compiled.getArray('roadTiles'))
+        self.roads = []
+        i = 0
+        for roadTargets in targets:
+            self.roads.append([(v, list(tiles[i + k])) for k, v in enumerate(roadTargets)])
+            i += len(roadTargets)
+
+    # Static grid distances to a goal tile, cached per goal (the goals are
+    # the few checkpoints of the layout).
+    def getGoalDists(self, goalIdx):
+        if goalIdx not in self.goalDists:
+            self.goalDists[goalIdx] = grid.bfsDistances(self.neighbours, goalIdx)
+        return self.goalDists[goalIdx]
+
+    # Lower bound on the cost from each road node to the goal, through the
+    # road graph: min over v of dist[u][v] + toGoal[v].
+    def getGoalHeuristic(self, goalIdx):
+        if goalIdx not in self.goalHeuristics:
+            goalDists = self.getGoalDists(goalIdx)
+            toGoal = [goalDists[idx] for idx in self.nodeTiles]
+            n = len(self.nodeTiles)
+            self.goalHeuristics[goalIdx] = [min([self.dist[u][v] + toGoal[v] for v in range(n)] + [float('inf')])
+                                            for u in range(n)]
+        return self.goalHeuristics[goalIdx]
+
+    # Function: Get Waypoint
+    # ---------------------
+    # The tile the grid planner should head for next: the goal itself when it
+    # is within Const.HIERARCHICAL_SEGMENT_TILES, otherwise the first road
+    # node not yet reached on the cheapest start -> roads -> goal route.
+    # tileCosts is indexed like a flat row-major list of extra costs (e.g.
+    # for likely car positions) charged for every tile along a road; only
+    # the tiles of the roads searched are read.
+    def getWaypoint(self, start, goal, tileCosts=None):
+        self.numPlans += 1
+        startIdx = start[0] * self.numCols + start[1]
+        goalIdx = goal[0] * self.numCols + goal[1]
+        goalDists = self.getGoalDists(goalIdx)
+        if goalDists[startIdx] <= self.segmentTiles:
+            self.numDirect += 1
+            return goal
+
+        entryDists = self.getEntryDists(startIdx)
+        path = self.searchRoads(entryDists, goalIdx, tileCosts)
+        for u in path:
+            if entryDists[u] > self.reachedTiles:
+                return divmod(self.nodeTiles[u], self.numCols)
+        self.numDirect += 1
+        return goal
+
+    # Static grid distances from the start tile to the road nodes within
+    # the length of the longest road, so that the nodes at both ends of the
+    # road the AutoCar is on are included. Where there are none, the
+    # distances to every road node.
+    def getEntryDists(self, startIdx):
+        entryDists = {}
+        for idx, d in grid.bfsDistancesUpTo(self.neighbours, startIdx, self.entryDist).items():
+            u = self.tileNodes.get(idx)
+            if u is not None: entryDists[u] = d
+        if not entryDists:
+            startDists = grid.bfsDistances(self.neighbours, startIdx)
+            for u, idx in enumerate(self.nodeTiles):
+                if startDists[idx] != float('inf'): entryDists[u] = startDists[idx]
+        return entryDists
+
+    # A* over the road nodes, entered from the start tile (at the distances
+    # in entryDists) and left to the goal tile along static grid paths.
+    # Returns the road nodes of the cheapest route, or an empty list.
+    def searchRoads(self, entryDists, goalIdx, tileCosts):
+        inf = float('inf')
+        n = len(self.nodeTiles)
+        goalDists = self.getGoalDists(goalIdx)
+        heuristic = self.getGoalHeuristic(goalIdx)
+        g = {}
+        parent = {}
+        openList = []
+        for u, d in entryDists.items():
+            if tileCosts is not None:
+                d += tileCosts[self.nodeTiles[u]]
+            g[u] = d
+            parent[u] = None
+            heapq.heappush(openList, (d + heuristic[u], u))
+        # the goal is the extra state n
+        closed = set()
+        while openList:
+            f, u = heapq.heappop(openList)
+            if u in closed: continue
+            closed.add(u)
+            if u == n: break
+            gU = g[u]
+            exitCost = gU + goalDists[self.nodeTiles[u]]
+            if exitCost < g.get(n, inf):
+                g[n] = exitCost
+                parent[n] = u
+                heapq.heappush(openList, (exitCost, n))
+            for v, tiles in self.roads[u]:
+                if v in closed: continue
+                cost = gU + len(tiles)
+                if tileCosts is not None:
+                    cost += sum(tileCosts[idx] for idx in tiles)
+                if cost < g.get(v, inf):
+                    g[v] = cost
+                    parent[v] = u
+                    heapq.heappush(openList, (cost + heuristic[v], v))
+        if n not in parent: return []
+        path = []
+        u = parent[n]
+        while u is not None:
+            path.append(u)
+            u = parent[u]
+        path.reverse()
+        return path
+
+    def getDirectRatio(self):
+        if self.numPlans == 0: return 0.0
+        return self.numDirect / self.numPlans
@@ -0,0 +1,160 @@
+'''
+Monte Carlo collision risk of short AutoCar trajectories.
+
+For every belief snapshot, Const.RISK_PARTICLES particles per car are drawn
+from its belief grid and rolled forward Const.RISK_STEPS estimator ticks
+through the transition model (parked cars stay put). Each particle is a car
+sized box centred at a random point of its tile, heading along its last
+move. A candidate trajectory gives one AutoCar pose per estimator tick; its
+risk is the probability that at least one car collides with it, where each
+car contributes the fraction of its particles that overlap the AutoCar's box
+(collision.collidesWith, the test of Car.collides) at some step.
+
+Particles are stored per car and step as flat coordinate lists, and the
+result of every candidate is cached until the next snapshot.
+'''
+from engine.const import Const
+from engine.model import collision
+
+import math
+import random
+import util
+
+
+# The four axis-aligned headings a particle that has not moved yet can have.
+HEADINGS = [(1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0)]
+
+
+class ParticleSet(object):
+
+    # xs[h], ys[h], dxs[h], dys[h] are the centres and unit headings of the
+    # particles h estimator ticks from now.
+    def __init__(self, xs, ys, dxs, dys):
+        self.xs = xs
+        self.ys = ys
+        self.dxs = dxs
+        self.dys = dys
+
+
+class CollisionRisk(object):
+
+    def __init__(self, transModel, numParticles=None, numSteps=None):
+        self.transModel = transModel
+        self.numCols = transModel.numCols
+        self.numParticles = numParticles if numParticles is not None else Const.RISK_PARTICLES
+        self.numSteps = numSteps if numSteps is not None else Const.RISK_STEPS
+        # a private generator, so evaluating risk does not change the
+        # simulation's random sequence
+        self.rng = random.Random(0)
+        self.beliefs = None
+        self.particles = []
+        self.cache = {}
+        self.numRequests = 0
+        self.numEvaluated = 0
+
+    # Function: Set Beliefs
+    # ---------------------
+    # Resamples the particles when a new belief snapshot arrives.
+    def setBeliefs(self, beliefs, parkedCars):
+        if beliefs is self.beliefs: return
+        self.beliefs = beliefs
+        self.cache = {}
+        self.particles = [self.sampleCar(belief, parked)
+                          for belief, parked in zip(beliefs, parkedCars)]
+
+    def sampleCar(self, belief, parked):
+        rng = self.rng
+        numCols = self.numCols
+        tileSize = Const.BELIEF_TILE_SIZE
+        weights = [p for row in belief.grid for p in row]
+        if sum(weights) <= 0:
+            return ParticleSet(*[[[] for _ in range(self.numSteps + 1)] for _ in range(4)])
+        tiles = rng.choices(range(len(weights)), weights, k=self.numParticles)
+        offsets = [(rng.random() - 0.5, rng.random() - 0.5) for _ in tiles]
+        headings = [HEADINGS[rng.randrange(4)] for _ in tiles]
+
+        xs, ys, dxs, dys = [], [], [], []
+        for h in range(self.numSteps + 1):
+            if h > 0 and not parked:
+                tiles, headings = self.stepParticles(tiles, headings)
+            xs.append([(util.colToX(i % numCols) + ox * tileSize) for i, (ox, oy) in zip(tiles, offsets)])
+            ys.append([(util.rowToY(i // numCols) + oy * tileSize) for i, (ox, oy) in zip(tiles, offsets)])
+            dxs.append([d[0] for d in headings])
+            dys.append([d[1] for d in headings])
+        return ParticleSet(xs, ys, dxs, dys)
+
+    # Samples one transition per particle; a particle that moves turns to
+    # face the direction of the move.
+    def stepParticles(self, tiles, headings):
+        rng = self.rng
+        numCols = self.numCols
+        successors = self.transModel.successors
+        newTiles = []
+        newHeadings = []
+        for i, heading in zip(tiles, headings):
+            u = rng.random()
+            j = i
+            for j, p in successors[i]:
+                u -= p
+                if u <= 0: break
+            if j != i:
+                dr = j // numCols - i // numCols
+                dc = j % numCols - i % numCols
+                norm = math.sqrt(dr * dr + dc * dc)
+                heading = (dc / norm, dr / norm)
+            newTiles.append(j)
+            newHeadings.append(heading)
+        return newTiles, newHeadings
+
+    # Function: Evaluate
+    # ---------------------
+    # trajectory is a sequence of AutoCar poses (x, y, dirX, dirY), one per
+    # estimator tick starting one tick from now; poses past Const.RISK_STEPS
+    # are ignored. Returns the probability of colliding with any car.
+    def evaluate(self, trajectory):
+        self.numRequests += 1
+        key = tuple((round(x), round(y), round(dx, 2), round(dy, 2)) for (x, y, dx, dy) in trajectory)
+        if key in self.cache:
+            return self.cache[key]
+        self.numEvaluated += 1
+        noCollision = 1.0
+        for particleSet in self.particles:
+            noCollision *= 1.0 - self.getCarRisk(particleSet, trajectory)
+        risk = 1.0 - noCollision
+        self.cache[key] = risk
+        return risk
+
+    def getCarRisk(self, particleSet, trajectory):
+        numParticles = len(particleSet.xs[0])
+        if numParticles == 0: return 0.0
+        hit = [False] * numParticles
+        for h, (x, y, dx, dy) in enumerate(trajectory[:self.numSteps]):
+            norm = math.sqrt(dx * dx + dy * dy)
+            if norm == 0: continue
+            mask = collision.collidesWith(x, y, dx / norm, dy / norm,
+                                          particleSet.xs[h + 1], particleSet.ys[h + 1],
+                                          particleSet.dxs[h + 1], particleSet.dys[h + 1])
+            hit = [a or b for a, b in zip(hit, mask)]
+        return sum(hit) / numParticles
+
+    # Share of evaluate() calls answered from the cache.
+    def getHitRate(self):
+        if self.numRequests == 0: return 0.0
+        return 1.0 - self.numEvaluated / self.numRequests
+
+
+# Function: Straight Line Trajectory
+# ---------------------
+# AutoCar poses for the next numSteps estimator ticks when driving from pos
+# towards target at speed pixels per UI heartbeat, stopping at target.
+def straightLineTrajectory(pos, target, speed, numSteps):
+    dx = target[0] - pos[0]
+    dy = target[1] - pos[1]
+    dist = math.sqrt(dx * dx + dy * dy)
+    if dist == 0: return []
+    perTick = speed * Const.SECONDS_PER_HEARTBEAT / Const.SECONDS_PER_UI_HEARTBEAT
+    trajectory = []
+    for h in range(1, numSteps + 1):
+        t = min(1.0, perTick * h / dist)
+        trajectory.append((pos[0] + dx * t, pos[1] + dy * t, dx, dy))
+    return trajectory
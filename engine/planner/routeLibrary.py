@@ -0,0 +1,151 @@
+'''
+Static routes between the checkpoints of a layout.
+
+A route is the cheapest path on the obstacle/clearance cost field (no other
+cars) for one leg of the course: from the AutoCar's start tile to the first
+checkpoint, then from each checkpoint to the next. The routes only depend on
+the layout, so they are computed once and stored in Const.LAYOUT_CACHE_DIR
+under a hash of the layout data and of the constants the costs depend on.
+'''
+from engine.const import Const
+from engine.planner import grid
+
+import hashlib
+import heapq
+import json
+import os
+import util
+
+
+class Route(object):
+
+    def __init__(self, path, cost):
+        # path is a list of (row, col) tiles, both ends included
+        self.path = path
+        self.cost = cost
+        self.index = {tile: i for i, tile in enumerate(path)}
+
+    def getPath(self):
+        return self.path
+
+    def getCost(self):
+        return self.cost
+
+    def getLength(self):
+        return len(self.path)
+
+    # Position of tile along the route, or None if the route does not pass
+    # through it.
+    def getIndex(self, tile):
+        return self.index.get(tile)
+
+    def getTile(self, i):
+        return self.path[min(max(i, 0), len(self.path) - 1)]
+
+
+class RouteLibrary(object):
+
+    CACHE_VERSION = 1
+
+    # tileCosts is a flat row-major list with the static cost of entering
+    # each tile on top of the unit step cost (e.g. ClearanceMap.getCosts()).
+    def __init__(self, layout, freeTiles, tileCosts):
+        self.numRows = layout.getBeliefRows()
+        self.numCols = layout.getBeliefCols()
+        self.free = grid.buildFreeMask(freeTiles, self.numRows, self.numCols)
+        self.neighbours = grid.buildNeighbours(self.free, self.numRows, self.numCols)
+        self.tileCosts = tileCosts
+        startTile = (util.yToRow(layout.getStartY()), util.xToCol(layout.getStartX()))
+        self.stops = [startTile] + layout.getCheckPoints()
+        self.key = self.getCacheKey(layout)
+        self.cachePath = os.path.join(Const.LAYOUT_CACHE_DIR, self.key + '.routes.json')
+        self.loadedFromCache = False
+        self.routes = self.loadRoutes()
+        if self.routes is None:
+            self.routes = self.computeRoutes()
+            self.saveRoutes()
+
+    def getCacheKey(self, layout):
+        content = json.dumps({
+            'version': RouteLibrary.CACHE_VERSION,
+            'layout': layout.data,
+            'tileSize': Const.BELIEF_TILE_SIZE,
+            'tileCosts': self.tileCosts,
+        }, sort_keys=True)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    # A missing, truncated or otherwise unreadable file is a cache miss.
+    def loadRoutes(self):
+        if not os.path.exists(self.cachePath): return None
+        try:
+            with open(self.cachePath) as cacheFile:
+                data = json.load(cacheFile)
+            if data.get('key') != self.key: return None
+            routes = [Route([tuple(tile) for tile in route['path']], route['cost'])
+                      for route in data['routes']]
+        except (ValueError, KeyError, TypeError, AttributeError, OSError):
+            return None
+        self.loadedFromCache = True
+        return routes
+
+    # The file is written next to its final path and renamed, so concurrent
+    # or interrupted runs never leave a partial file. The cache is only an
+    # optimisation, so failing to write it is not an error.
+    def saveRoutes(self):
+        data = {
+            'key': self.key,
+            'routes': [{'path': route.getPath(), 'cost': route.getCost()} for route in self.routes],
+        }
+        tempPath = '%s.%d.tmp' % (self.cachePath, os.getpid())
+        try:
+            if not os.path.isdir(Const.LAYOUT_CACHE_DIR):
+                os.makedirs(Const.LAYOUT_CACHE_DIR)
+            with open(tempPath, 'w') as cacheFile:
+                json.dump(data, cacheFile)
+            os.replace(tempPath, self.cachePath)
+        except OSError:
+            if os.path.exists(tempPath): os.remove(tempPath)
+
+    def computeRoutes(self):
+        routes = []
+        for i in range(len(self.stops) - 1):
+            routes.append(self.findRoute(self.stops[i], self.stops[i + 1]))
+        return routes
+
+    # Dijkstra on the static cost field. Returns a single-tile route if the
+    # goal is unreachable.
+    def findRoute(self, start, goal):
+        numCols = self.numCols
+        startIdx = start[0] * numCols + start[1]
+        goalIdx = goal[0] * numCols + goal[1]
+        distance = {startIdx: 0.0}
+        prev = {startIdx: None}
+        visited = set()
+        priorityQueue = [(0.0, startIdx)]
+        while priorityQueue:
+            d, idx = heapq.heappop(priorityQueue)
+            if idx in visited: continue
+            visited.add(idx)
+            if idx == goalIdx: break
+            for j in self.neighbours[idx]:
+                newD = d + 1 + self.tileCosts[j]
+                if newD < distance.get(j, float('inf')):
+                    distance[j] = newD
+                    prev[j] = idx
+                    heapq.heappush(priorityQueue, (newD, j))
+        if goalIdx not in visited:
+            return Route([start], 0.0)
+        path = []
+        idx = goalIdx
+        while idx is not None:
+            path.append(divmod(idx, numCols))
+            idx = prev[idx]
+        path.reverse()
+        return Route(path, distance[goalIdx])
+
+    # The route of the leg that ends at checkpoint chkPtsSoFar.
+    def getRoute(self, chkPtsSoFar):
+        return self.routes[chkPtsSoFar]
+
+    def getNumRoutes(self):
+        return len(self.routes)
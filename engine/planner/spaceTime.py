@@ -0,0 +1,162 @@
+'''
+Space-time A* over occupancy forecasts.
+
+States are (tile, t) for t up to the forecast horizon. Moving into a
+neighbouring tile and waiting in place are both explicit actions whose cost
+depends on the forecast occupancy at t + 1. Past the horizon the remaining
+cost is the static (obstacle-only) distance to the goal, which is also the
+heuristic, so a state popped at the horizon closes the search.
+'''
+from engine.const import Const
+from engine.planner import grid
+
+import heapq
+import itertools
+import time
+
+
+class SpaceTimePlan(object):
+
+    def __init__(self, path):
+        # path is a list of (tile, t) starting with the current state
+        self.path = path
+
+    def getPath(self):
+        return self.path
+
+    # The first tile we actually move into, or the start tile if the plan
+    # only waits.
+    def getNextTile(self):
+        start = self.path[0][0]
+        for tile, _ in self.path[1:]:
+            if tile != start: return tile
+        return start
+
+    def waitsFirst(self):
+        return len(self.path) < 2 or self.path[1][0] == self.path[0][0]
+
+
+class SpaceTimePlanner(object):
+
+    # tileCosts optionally maps (row, col) to an extra static cost for
+    # entering that tile, e.g. to keep away from walls.
+    def __init__(self, freeTiles, numRows, numCols, tileCosts=None, horizon=None):
+        self.numRows = numRows
+        self.numCols = numCols
+        self.horizon = horizon if horizon is not None else Const.FORECAST_HORIZON
+        self.free = grid.buildFreeMask(freeTiles, numRows, numCols)
+        self.tileCosts = [0.0] * (numRows * numCols)
+        if tileCosts:
+            for (row, col), cost in tileCosts.items():
+                if 0 <= row < numRows and 0 <= col < numCols:
+                    self.tileCosts[row * numCols + col] = cost
+        self.neighbours = grid.buildNeighbours(self.free, numRows, numCols)
+        self.staticDists = {}
+        self.maxNodes = Const.SPACE_TIME_MAX_NODES
+        self.maxOpen = Const.SPACE_TIME_MAX_OPEN
+        self.blockedProb = Const.SPACE_TIME_BLOCKED_PROB
+        self.waitCost = Const.SPACE_TIME_WAIT_COST
+        self.numPlans = 0
+        self.numBudgetHits = 0
+        self.numExpanded = 0
+
+    # Unit-cost BFS from the goal over free tiles, cached per goal. Every
+    # action costs at least 1, so this never overestimates.
+    def getStaticDists(self, goalIdx):
+        if goalIdx in self.staticDists:
+            return self.staticDists[goalIdx]
+        dists = grid.bfsDistances(self.neighbours, goalIdx)
+        self.staticDists[goalIdx] = dists
+        return dists
+
+    # Function: Plan
+    # ---------------------
+    # start and goal are (row, col) tiles. forecast is an engine.planner.
+    # forecast.Forecast. The search stops after maxNodes expansions or when
+    # timeBudget seconds have elapsed and returns the most promising partial
+    # plan found so far.
+    def plan(self, start, goal, forecast, occupancyWeight, timeBudget=None):
+        if timeBudget is None:
+            timeBudget = Const.SECONDS_PER_UI_HEARTBEAT * Const.SPACE_TIME_TIME_FRACTION
+        deadline = time.time() + timeBudget
+        if Const.TURBO:
+            # wall-clock budgets would make turbo runs irreproducible
+            deadline = float('inf')
+        numCols = self.numCols
+        startIdx = start[0] * numCols + start[1]
+        goalIdx = goal[0] * numCols + goal[1]
+        dists = self.getStaticDists(goalIdx)
+        horizon = min(self.horizon, forecast.getHorizon())
+        occupancy = [forecast.getOccupancy(t) for t in range(horizon + 1)]
+        tileCosts = self.tileCosts
+
+        counter = itertools.count()
+        startState = (startIdx, 0)
+        gScore = {startState: 0.0}
+        parent = {startState: None}
+        closed = set()
+        openList = [(dists[startIdx], next(counter), startState)]
+        best = startState
+        bestKey = (dists[startIdx], dists[startIdx])
+        expanded = 0
+        budgetHit = False
+        found = None
+
+        while openList:
+            f, _, state = heapq.heappop(openList)
+            if state in closed: continue
+            idx, t = state
+            if idx == goalIdx or t == horizon:
+                found = state
+                break
+            closed.add(state)
+            expanded += 1
+            if expanded >= self.maxNodes or time.time() > deadline:
+                budgetHit = True
+                break
+
+            g = gScore[state]
+            nextOcc = occupancy[t + 1]
+            # waiting is just another successor that keeps the tile
+            for j in self.neighbours[idx] + (idx,):
+                p = nextOcc[j]
+                if p > self.blockedProb and j != startIdx: continue
+                nextState = (j, t + 1)
+                if nextState in closed: continue
+                stepCost = self.waitCost if j == idx else 1.0 + tileCosts[j]
+                newG = g + stepCost + occupancyWeight * p
+                if newG < gScore.get(nextState, float('inf')):
+                    gScore[nextState] = newG
+                    parent[nextState] = state
+                    h = dists[j]
+                    heapq.heappush(openList, (newG + h, next(counter), nextState))
+                    key = (newG + h, h)
+                    if key < bestKey:
+                        best = nextState
+                        bestKey = key
+
+            if len(openList) > self.maxOpen:
+                openList = heapq.nsmallest(self.maxOpen // 2, openList)
+                heapq.heapify(openList)
+
+        state = found if found is not None else best
+        path = []
+        while state is not None:
+            idx, t = state
+            path.append(((idx // numCols, idx % numCols), t))
+            state = parent[state]
+        path.reverse()
+        self.numPlans += 1
+        self.numExpanded += expanded
+        if budgetHit: self.numBudgetHits += 1
+        return SpaceTimePlan(path)
+
+    # Share of plans cut short by the node budget or the deadline, which
+    # return the most promising partial plan instead.
+    def getBudgetHitRate(self):
+        if self.numPlans == 0: return 0.0
+        return self.numBudgetHits / self.numPlans
+
+    def getMeanExpanded(self):
+        if self.numPlans == 0: return 0.0
+        return self.numExpanded / self.numPlans
@@ -0,0 +1,102 @@
+'''
+Per-tile attribute bitmap for the planner.
+
+One byte per belief tile, row-major, with a bit per attribute. Membership
+queries are O(1) and whole-map masks are produced with bytes.translate, so
+building planner structures never has to scan Python lists of tiles.
+'''
+
+
+class TileMap(object):
+
+    OBSTACLE = 1
+    CHECKPOINT = 2
+    CAR_NEAR = 4
+
+    # TRANSLATE[flag] maps every byte value to 1 if the flag is set, else 0.
+    TRANSLATE = {
+        flag: bytes(1 if value & flag else 0 for value in range(256))
+        for flag in (OBSTACLE, CHECKPOINT, CAR_NEAR)
+    }
+
+    # compiled, if given, is the CompiledLayout of the layout, which holds
+    # the static (obstacle and checkpoint) flags.
+    def __init__(self, layout, compiled=None):
+        self.numRows = layout.getBeliefRows()
+        self.numCols = layout.getBeliefCols()
+        self.carNearTiles = []
+        if compiled is not None:
+            self.flags = bytearray(compiled.getArray('tileFlags'))
+            return
+        self.flags = bytearray(self.numRows * self.numCols)
+        for block in layout.getBlockData():
+            self.addBlock(block)
+        for cpt in layout.getCheckPoints():
+            self.set(cpt, TileMap.CHECKPOINT)
+
+    # Blocks are [x1, y1, x2, y2] in block tiles.
+    def addBlock(self, block):
+        row1, col1, row2, col2 = block[1], block[0], block[3], block[2]
+        for r in range(row1, row2):
+            for c in range(col1, col2):
+                self.set((r, c), TileMap.OBSTACLE)
+
+    def inGrid(self, tile):
+        return 0 <= tile[0] < self.numRows and 0 <= tile[1] < self.numCols
+
+    def set(self, tile, flag):
+        if not self.inGrid(tile): return
+        self.flags[tile[0] * self.numCols + tile[1]] |= flag
+
+    def clear(self, tile, flag):
+        if not self.inGrid(tile): return
+        self.flags[tile[0] * self.numCols + tile[1]] &= ~flag
+
+    # Tiles outside the grid have no attributes.
+    def has(self, tile, flag):
+        if not self.inGrid(tile): return False
+        return self.flags[tile[0] * self.numCols + tile[1]] & flag != 0
+
+    def isFree(self, tile):
+        if not self.inGrid(tile): return False
+        return self.flags[tile[0] * self.numCols + tile[1]] & TileMap.OBSTACLE == 0
+
+    def isObstacle(self, tile):
+        return self.has(tile, TileMap.OBSTACLE)
+
+    def isCheckPoint(self, tile):
+        return self.has(tile, TileMap.CHECKPOINT)
+
+    def isCarNear(self, tile):
+        return self.has(tile, TileMap.CAR_NEAR)
+
+    # Marks every tile within radius (Chebyshev) of the given car tiles as
+    # CAR_NEAR, replacing the previous marks.
+    def setCarsNear(self, carTiles, radius=1):
+        for tile in self.carNearTiles:
+            self.clear(tile, TileMap.CAR_NEAR)
+        self.carNearTiles = []
+        for (row, col) in carTiles:
+            for dr in range(-radius, radius + 1):
+                for dc in range(-radius, radius + 1):
+                    tile = (row + dr, col + dc)
+                    if self.inGrid(tile):
+                        self.set(tile, TileMap.CAR_NEAR)
+                        self.carNearTiles.append(tile)
+
+    # Row-major bytes with 1 where flag is set.
+    def getMask(self, flag):
+        return self.flags.translate(TileMap.TRANSLATE[flag])
+
+    def getFreeMask(self):
+        return self.getMask(TileMap.OBSTACLE).translate(bytes([1, 0]) + bytes(254))
+
+    def getTiles(self, flag):
+        mask = self.getMask(flag)
+        numCols = self.numCols
+        return [divmod(i, numCols) for i in range(len(mask)) if mask[i]]
+
+    def getFreeTiles(self):
+        mask = self.getFreeMask()
+        numCols = self.numCols
+        return [divmod(i, numCols) for i in range(len(mask)) if mask[i]]
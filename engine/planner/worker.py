@@ -0,0 +1,139 @@
+'''
+Runs the intelligent driver's planner on its own thread.
+
+The UI thread drops the latest belief snapshot, with a copy of the
+AutoCar's pose, into an input mailbox and keeps steering towards the last published waypoint; the worker plans on the
+newest snapshot it finds and publishes the result to an output mailbox.
+Both mailboxes hold a single immutable object and are never locked:
+replacing or reading one attribute is atomic in CPython, and a newer
+message simply overwrites an older one that was never read. The worker
+plans from the pose in the request, never from the AutoCar itself, which
+the UI thread keeps moving.
+'''
+from engine.const import Const
+from engine.containers.streamingStats import StreamingStats
+
+import threading
+import traceback
+import time
+
+
+class Mailbox(object):
+
+    def __init__(self):
+        self.slot = None
+
+    def put(self, message):
+        self.slot = message
+
+    def peek(self):
+        return self.slot
+
+
+class PlanRequest(object):
+
+    # pose is (pos, dir, velocity), see IntelligentDriver.getPose.
+    def __init__(self, seq, beliefs, parkedCars, chkPtsSoFar, beliefTick, pose):
+        self.seq = seq
+        self.beliefs = beliefs
+        self.parkedCars = parkedCars
+        self.chkPtsSoFar = chkPtsSoFar
+        self.beliefTick = beliefTick
+        self.pose = pose
+        self.submitTime = time.time()
+
+
+class Plan(object):
+
+    def __init__(self, seq, goalPos, moveForward, beliefTick, planTime):
+        self.seq = seq
+        self.goalPos = goalPos
+        self.moveForward = moveForward
+        self.beliefTick = beliefTick
+        self.planTime = planTime
+        self.publishTime = time.time()
+
+    def getAge(self):
+        return time.time() - self.publishTime
+
+
+class PlannerWorker(threading.Thread):
+
+    def __init__(self, driver):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.driver = driver
+        self.inbox = Mailbox()
+        self.outbox = Mailbox()
+        self.wakeup = threading.Event()
+        self.stopFlag = threading.Event()
+        self.submitted = 0
+        self.lastPlannedSeq = 0
+        self.numPlans = 0
+        self.totalPlanTime = 0.0
+        # only written by the worker thread
+        self.planStats = StreamingStats()
+        self.numFollowed = 0
+        self.numStale = 0
+        self.totalAge = 0.0
+        self.maxAge = 0.0
+        self.totalStaleness = 0
+
+    # Called from the UI thread every heartbeat. Cheap: a copy of the
+    # AutoCar's pose, one attribute write and an event set.
+    def submit(self, beliefs, parkedCars, chkPtsSoFar, beliefTick):
+        self.submitted += 1
+        self.inbox.put(PlanRequest(self.submitted, beliefs, parkedCars, chkPtsSoFar, beliefTick,
+                                   self.driver.getPose()))
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stopFlag.is_set():
+            self.wakeup.wait(Const.SECONDS_PER_UI_HEARTBEAT)
+            self.wakeup.clear()
+            request = self.inbox.peek()
+            if request is None or request.seq == self.lastPlannedSeq: continue
+            self.lastPlannedSeq = request.seq
+            start = time.time()
+            try:
+                goalPos, moveForward = self.driver.getNextGoalPos(
+                    request.beliefs, request.parkedCars, request.chkPtsSoFar, request.pose)
+            except Exception:
+                traceback.print_exc()
+                continue
+            planTime = time.time() - start
+            self.numPlans += 1
+            self.totalPlanTime += planTime
+            self.planStats.addValue(planTime)
+            self.outbox.put(Plan(request.seq, goalPos, moveForward, request.beliefTick, planTime))
+
+    def stop(self):
+        self.stopFlag.set()
+        self.wakeup.set()
+
+    # Called from the UI thread. Returns the newest plan, or None if it is
+    # older than Const.ASYNC_MAX_PLAN_AGE seconds, and records how old and
+    # how many belief ticks behind the plan being followed is.
+    def getPlan(self, beliefTick):
+        plan = self.outbox.peek()
+        if plan is None: return None
+        age = plan.getAge()
+        self.numFollowed += 1
+        self.totalAge += age
+        self.maxAge = max(self.maxAge, age)
+        self.totalStaleness += beliefTick - plan.beliefTick
+        if age > Const.ASYNC_MAX_PLAN_AGE:
+            self.numStale += 1
+            return None
+        return plan
+
+    def getStats(self):
+        followed = max(self.numFollowed, 1)
+        return {
+            'plans': self.numPlans,
+            'meanPlanTime': self.totalPlanTime / max(self.numPlans, 1),
+            'meanPlanAge': self.totalAge / followed,
+            'maxPlanAge': self.maxAge,
+            'meanStaleTicks': self.totalStaleness / followed,
+            'staleHeartbeats': self.numStale,
+        }
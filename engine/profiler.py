@@ -0,0 +1,141 @@
+'''
+Nested timing spans for the simulation loop.
+
+    with profiler.span('infer'):
+        ...
+
+records the wall time spent in the block, on the calling thread. Spans can
+be nested; the nesting is recovered from the timestamps. While the
+profiler is disabled (the default) span() returns a shared no-op context,
+so instrumented code pays one attribute lookup and one call per span.
+
+At the end of a run, writeTrace() exports the spans as Chrome trace-event
+JSON (open it in chrome://tracing or Perfetto) and getSummary() gives count,
+total and percentiles of every span name.
+'''
+import json
+import math
+import os
+import threading
+import time
+
+
+class NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+
+    __slots__ = ['profiler', 'name', 'start']
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        end = time.perf_counter()
+        # list.append is atomic, so threads can share the event list
+        self.profiler.events.append((self.name, threading.get_ident(), self.start, end - self.start))
+        return False
+
+
+class Profiler(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self.events = []
+        self.origin = time.perf_counter()
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name):
+        if not self.enabled: return NULL_SPAN
+        return Span(self, name)
+
+    def getEvents(self):
+        return self.events
+
+    # Function: Get Trace
+    # ---------------------
+    # The spans as Chrome trace "complete" events, in microseconds since
+    # enable().
+    def getTrace(self):
+        threadIds = {}
+        traceEvents = []
+        for name, thread, start, duration in self.events:
+            tid = threadIds.setdefault(thread, len(threadIds) + 1)
+            traceEvents.append({
+                'name': name,
+                'ph': 'X',
+                'pid': os.getpid(),
+                'tid': tid,
+                'ts': (start - self.origin) * 1e6,
+                'dur': duration * 1e6,
+            })
+        return {'traceEvents': traceEvents, 'displayTimeUnit': 'ms'}
+
+    def writeTrace(self, path):
+        with open(path, 'w') as traceFile:
+            json.dump(self.getTrace(), traceFile)
+
+    # Function: Get Summary
+    # ---------------------
+    # Maps every span name to its count, total, mean, p50, p90, p99 and max
+    # duration in seconds.
+    def getSummary(self):
+        durations = {}
+        for name, _, _, duration in self.events:
+            durations.setdefault(name, []).append(duration)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'total': sum(values),
+                'mean': sum(values) / len(values),
+                'p50': percentile(values, 50),
+                'p90': percentile(values, 90),
+                'p99': percentile(values, 99),
+                'max': values[-1],
+            }
+        return summary
+
+    def printSummary(self):
+        summary = self.getSummary()
+        print('%-16s %7s %9s %9s %9s %9s %9s %9s' % (
+            'span', 'count', 'total s', 'mean ms', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+        for name in sorted(summary, key=lambda name: -summary[name]['total']):
+            stats = summary[name]
+            print('%-16s %7d %9.3f %9.3f %9.3f %9.3f %9.3f %9.3f' % (
+                name, stats['count'], stats['total'], 1000 * stats['mean'], 1000 * stats['p50'],
+                1000 * stats['p90'], 1000 * stats['p99'], 1000 * stats['max']))
+
+
+# Function: Percentile
+# ---------------------
+# Nearest-rank percentile of a sorted, non-empty list.
+def percentile(values, p):
+    rank = int(math.ceil(p / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+# the profiler shared by the whole simulator
+profiler = Profiler()
@@ -0,0 +1,147 @@
+'''
+Compact binary traces of episodes.
+
+A trace holds, for every controller tick, the inputs the estimators and
+the planner see: the AutoCar pose and checkpoint count, and for every StdCar
+its true pose when it was observed, the sonar reading and its parked flag.
+Columns are flat typed arrays (car columns are tick-major, numCars values
+per tick), so a trace of thousands of ticks is a few hundred kilobytes.
+
+File layout: MAGIC, the length of the JSON header as a little-endian
+uint32, the header (layout, number of cars, seed, the constants the inputs
+depend on, and the name, type code and length of every column), then the
+raw bytes of every column in header order.
+'''
+from engine.const import Const
+
+import array
+import json
+import struct
+import sys
+
+
+MAGIC = b'DCTRACE1'
+
+TICK_COLUMNS = [('juniorX', 'd'), ('juniorY', 'd'), ('juniorDirX', 'd'), ('juniorDirY', 'd'),
+                ('checkPoints', 'i')]
+CAR_COLUMNS = [('carX', 'd'), ('carY', 'd'), ('carDirX', 'd'), ('carDirY', 'd'),
+               ('sonar', 'd'), ('parked', 'b')]
+
+
+class Trace(object):
+
+    def __init__(self, header, columns):
+        self.header = header
+        self.columns = columns
+        self.numCars = header['numCars']
+
+    def getHeader(self):
+        return self.header
+
+    def getNumTicks(self):
+        return len(self.columns['juniorX'])
+
+    def getNumCars(self):
+        return self.numCars
+
+    def getColumn(self, name):
+        return self.columns[name]
+
+    def getJunior(self, tick):
+        c = self.columns
+        return c['juniorX'][tick], c['juniorY'][tick], c['juniorDirX'][tick], c['juniorDirY'][tick]
+
+    def getCheckPoints(self, tick):
+        return self.columns['checkPoints'][tick]
+
+    def getCar(self, tick, car):
+        i = tick * self.numCars + car
+        c = self.columns
+        return c['carX'][i], c['carY'][i], c['carDirX'][i], c['carDirY'][i]
+
+    def getSonar(self, tick, car):
+        return self.columns['sonar'][tick * self.numCars + car]
+
+    def isParked(self, tick, car):
+        return bool(self.columns['parked'][tick * self.numCars + car])
+
+
+class TraceRecorder(object):
+
+    def __init__(self, layoutName, numCars, seed):
+        self.header = {
+            'layout': layoutName,
+            'numCars': numCars,
+            'seed': seed,
+            'inference': Const.INFERENCE,
+            'sonarStd': Const.SONAR_STD,
+            'beliefTileSize': Const.BELIEF_TILE_SIZE,
+            'secondsPerHeartbeat': Const.SECONDS_PER_HEARTBEAT,
+        }
+        self.columns = {}
+        for name, typecode in TICK_COLUMNS + CAR_COLUMNS:
+            self.columns[name] = array.array(typecode)
+
+    # Function: Add Tick
+    # ---------------------
+    # junior and cars are Car objects (read at observation time), sonar the
+    # observed distances and parked the parked flags, one per car.
+    def addTick(self, junior, checkPoints, cars, sonar, parked):
+        c = self.columns
+        c['juniorX'].append(junior.pos.x)
+        c['juniorY'].append(junior.pos.y)
+        c['juniorDirX'].append(junior.dir.x)
+        c['juniorDirY'].append(junior.dir.y)
+        c['checkPoints'].append(checkPoints)
+        for car, dist, isParked in zip(cars, sonar, parked):
+            c['carX'].append(car.pos.x)
+            c['carY'].append(car.pos.y)
+            c['carDirX'].append(car.dir.x)
+            c['carDirY'].append(car.dir.y)
+            c['sonar'].append(dist)
+            c['parked'].append(1 if isParked else 0)
+
+    def getTrace(self):
+        return Trace(dict(self.header), self.columns)
+
+    def write(self, path):
+        writeTrace(self.getTrace(), path)
+
+
+def writeTrace(trace, path):
+    header = dict(trace.header)
+    header['columns'] = [[name, typecode, len(trace.columns[name])]
+                         for name, typecode in TICK_COLUMNS + CAR_COLUMNS]
+    headerBytes = json.dumps(header).encode('utf-8')
+    with open(path, 'wb') as traceFile:
+        traceFile.write(MAGIC)
+        traceFile.write(struct.pack('<I', len(headerBytes)))
+        traceFile.write(headerBytes)
+        for name, _, _ in header['columns']:
+            column = trace.columns[name]
+            if sys.byteorder != 'little':
+                column = array.array(column.typecode, column)
+                column.byteswap()
+            traceFile.write(column.tobytes())
+
+
+def readTrace(path):
+    with open(path, 'rb') as traceFile:
+        data = traceFile.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise Exception(path + ' is not a trace file')
+    offset = len(MAGIC)
+    (headerLength,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    header = json.loads(data[offset:offset + headerLength].decode('utf-8'))
+    offset += headerLength
+    columns = {}
+    for name, typecode, length in header.pop('columns'):
+        column = array.array(typecode)
+        size = column.itemsize * length
+        column.frombytes(data[offset:offset + size])
+        if sys.byteorder != 'little':
+            column.byteswap()
+        columns[name] = column
+        offset += size
+    return Trace(header, columns)
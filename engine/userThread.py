@@ -1,6 +1,9 @@
 from .const import Const
 from .view.display import Display
 from .vector import Vec2d
+from .planner.worker import PlannerWorker
+from .profiler import profiler
+from .containers.streamingStats import StreamingStats, WindowedRate
 
 
 import time
@@ -18,8 +21,17 @@ class UserThread(threading.Thread):
         self.quit = False
         self.victory = False
         self.stopFlag = threading.Event()
+        self.plannerWorker = None
+        self.heartbeatStats = StreamingStats()
+        self.missedHeartbeats = WindowedRate(Const.SLO_WINDOW)
+        self.planStats = StreamingStats()
+        # in turbo mode there is no thread to run the worker beside
+        if Const.INTELLIGENT_DRIVER and Const.ASYNC_PLANNER and not Const.TURBO:
+            self.plannerWorker = PlannerWorker(junior)
         
     def run(self):
+        if self.plannerWorker:
+            self.plannerWorker.start()
         while not self.shouldStop():
             startTime = time.time()
             self.heartbeat()
@@ -37,11 +49,22 @@ class UserThread(threading.Thread):
                 
     def stop(self):
         self.stopFlag.set()
+        if self.plannerWorker:
+            self.plannerWorker.stop()
                 
     def hasCollided(self):
         return self.collision
 
-    def heartbeat(self):        
+    def heartbeat(self):
+        start = time.time()
+        with profiler.span('heartbeat'):
+            self.juniorHeartbeat()
+        duration = time.time() - start
+        self.heartbeatStats.addValue(duration)
+        if duration > Const.SECONDS_PER_UI_HEARTBEAT:
+            self.missedHeartbeats.addEvent()
+
+    def juniorHeartbeat(self):
         oldDir = Vec2d(self.junior.dir.x, self.junior.dir.y)
         oldPos = Vec2d(self.junior.pos.x, self.junior.pos.y)
         quitAction = self.junior.action()
@@ -52,32 +75,55 @@ class UserThread(threading.Thread):
             carProb = self.model.getProbCar()
 
         if carProb and Const.AUTO:
-            parkedCars = [c.getParkedStatus() for c in self.model.getOtherCars()]
-            if Const.INTELLIGENT_DRIVER:
-                self.junior.intelligent_autonomousAction(carProb, parkedCars, self.model.nextCheckPtIdx)
-            else:
-                agentGraph = self.model.getJuniorGraph()
-                try:
-                    # to avoid raising exception when out of bounds
-                    self.junior.autonomousAction(carProb, agentGraph)
-                except:
-                    pass
+            start = time.time()
+            with profiler.span('plan'):
+                self.plan(carProb)
+            # with a worker, this only follows its plan; the worker times
+            # the planning itself (see getPlanStats)
+            if not self.plannerWorker:
+                self.planStats.addValue(time.time() - start)
         
         if quitAction: 
             self.quit = True
             return
-        self.junior.update()
-        self.collision = self.model.checkCollision(self.junior)
+        with profiler.span('collision'):
+            self.junior.update()
+            self.collision = self.model.checkCollision(self.junior)
 
-        if not Const.MULTIPLE_GOALS:
-            self.victory = self.model.checkVictory()
-        else:
-            self.victory = self.model._checkVictory()
+            if not Const.MULTIPLE_GOALS:
+                self.victory = self.model.checkVictory()
+            else:
+                self.victory = self.model._checkVictory()
 
-        newPos = self.junior.getPos()
-        newDir = self.junior.getDir()
-        deltaPos = newPos - oldPos
-        deltaAngle = oldDir.get_angle_between(newDir)
-        Display.move(self.junior, deltaPos)
-        Display.rotate(self.junior, deltaAngle)
-        
+        # posted once the AutoCar has moved, so the worker plans from the
+        # pose the next heartbeat steers from
+        if self.plannerWorker and carProb and Const.AUTO:
+            parkedCars = [c.getParkedStatus() for c in self.model.getOtherCars()]
+            self.plannerWorker.submit(carProb, parkedCars, self.model.nextCheckPtIdx, self.model.getBeliefTick())
+
+        with profiler.span('display'):
+            newPos = self.junior.getPos()
+            newDir = self.junior.getDir()
+            deltaPos = newPos - oldPos
+            deltaAngle = oldDir.get_angle_between(newDir)
+            Display.move(self.junior, deltaPos)
+            Display.rotate(self.junior, deltaAngle)
+
+    # Latencies of the planner: of the worker's plans when there is one.
+    def getPlanStats(self):
+        if self.plannerWorker: return self.plannerWorker.planStats
+        return self.planStats
+
+    def plan(self, carProb):
+        if self.plannerWorker:
+            self.junior.followPlan(self.plannerWorker.getPlan(self.model.getBeliefTick()))
+        elif Const.INTELLIGENT_DRIVER:
+            parkedCars = [c.getParkedStatus() for c in self.model.getOtherCars()]
+            self.junior.intelligent_autonomousAction(carProb, parkedCars, self.model.nextCheckPtIdx)
+        else:
+            agentGraph = self.model.getJuniorGraph()
+            try:
+                # to avoid raising exception when out of bounds
+                self.junior.autonomousAction(carProb, agentGraph)
+            except:
+                pass
@@ -1,4 +1,5 @@
 from . import graphicsUtils
+from . import headlessGraphics
 from engine.model.car.car import Car
 from engine.const import Const
 from engine.model.observation import Observation
@@ -25,6 +26,9 @@ class Display(object):
     observations = []
     
     graphicsLock = threading.Lock()
+
+    # graphicsUtils, or headlessGraphics when Const.HEADLESS is set
+    graphics = graphicsUtils
     
     COLORS = [
         'purple',
@@ -53,7 +57,9 @@ class Display(object):
     
     @staticmethod
     def initGraphics(layout):
-        graphicsUtils.begin_graphics(
+        if Const.HEADLESS:
+            Display.graphics = headlessGraphics
+        Display.graphics.begin_graphics(
             width=layout.getWidth(), 
             height=layout.getHeight(), 
             color = Display.WHITE,
@@ -62,11 +68,15 @@ class Display(object):
         
     @staticmethod
     def endGraphics():
-        graphicsUtils.end_graphics()
+        Display.graphics.end_graphics()
 
     @staticmethod
     def raiseEndGraphics():
-        graphicsUtils.raiseEndGraphics()
+        Display.graphics.raiseEndGraphics()
+
+    @staticmethod
+    def refresh():
+        Display.graphics.refresh()
     
     @staticmethod
     def drawCar(car):
@@ -75,7 +85,7 @@ class Display(object):
         color = Display.GREY
         if car.isJunior():
             color = Display.BLACK
-        parts = graphicsUtils.rectangle(
+        parts = Display.graphics.rectangle(
             car.pos, Car.LENGTH, 
             Car.WIDTH, 
             color, 
@@ -90,11 +100,11 @@ class Display(object):
     
     @staticmethod
     def drawSquare(pos, size, color):
-        return graphicsUtils.square(pos, size, color)
+        return Display.graphics.square(pos, size, color)
     
     @staticmethod
     def drawFinish(block):
-        graphicsUtils.rectangle(
+        Display.graphics.rectangle(
                 block.getCenter(), 
                 block.getHeight(), 
                 block.getWidth(), 
@@ -106,7 +116,7 @@ class Display(object):
     @staticmethod
     def drawBlocks(blocks):
         for block in blocks:
-            graphicsUtils.rectangle(
+            Display.graphics.rectangle(
                 block.getCenter(), 
                 block.getHeight(), 
                 block.getWidth(), 
@@ -117,11 +127,14 @@ class Display(object):
         
     @staticmethod
     def drawCircle(pos, radius):
-        return graphicsUtils.circle(pos, radius, Display.RED, Display.RED)
+        return Display.graphics.circle(pos, radius, Display.RED, Display.RED)
     
     @staticmethod
     def drawBelief(model):
         Display.beliefVisible = []
+        Display.beliefParts = []
+        Display.beliefValue = []
+        Display.beliefColor = []
         for r in range(model.getBeliefRows()):
             beliefValueRow = []
             beliefPartRow = []
@@ -150,14 +163,14 @@ class Display(object):
         #print 'attempt get keys'
         Display._acquireLock()
         #print 'get keys'
-        keys = graphicsUtils.keys_waiting() + graphicsUtils.keys_pressed()
+        keys = Display.graphics.keys_waiting() + Display.graphics.keys_pressed()
         Display._releaseLock()
         return keys
     
     # make thread safe
     @staticmethod
     def graphicsSleep(timeToSleep):
-        graphicsUtils.sleep(timeToSleep)
+        Display.graphics.sleep(timeToSleep)
         #time.sleep(timeToSleep)
         '''for _ in range(int(timeToSleep / 0.005)):
             #print 'attempt sleep'
@@ -172,7 +185,7 @@ class Display(object):
         '''startWait = time.time()
         Display._acquireLock()
         timeToSleep -= time.time() - startWait
-        graphicsUtils.refresh()
+        Display.graphics.refresh()
         if timeToSleep > 0:
             graphicsUtils.sleep(timeToSleep)
         Display._releaseLock()'''
@@ -198,7 +211,7 @@ class Display(object):
         #print 'move'
         parts = Display.partDict[obj]
         #assert(parts)
-        graphicsUtils.move_by(parts, delta.x, delta.y)
+        Display.graphics.move_by(parts, delta.x, delta.y)
         #print 'end move'
         Display._releaseLock()
         
@@ -211,7 +224,7 @@ class Display(object):
         #print 'rotate'
         parts = Display.partDict[obj]
         #assert(parts)
-        graphicsUtils.rotate_by(parts, angle)
+        Display.graphics.rotate_by(parts, angle)
         Display._releaseLock()
                 
     @staticmethod
@@ -220,7 +233,7 @@ class Display(object):
         saturation = value
         hue = Display.COLOR_HUES[color]
         r, g, b = colorsys.hsv_to_rgb(hue, saturation, 1.0)
-        color = graphicsUtils.formatColor(r, g, b)
+        color = Display.graphics.formatColor(r, g, b)
         return color        
     
     @staticmethod
@@ -239,7 +252,7 @@ class Display(object):
         if oldColor != colorName and oldValue >= value: return
         if not isVisible and not wasVisible: return
         color = Display._getBeliefSquareColor(colorName, value)
-        graphicsUtils.changeColor(part, color)
+        Display.graphics.changeColor(part, color)
         Display.beliefValue[r][c] = value
         Display.beliefColor[r][c] = colorName
         
@@ -262,7 +275,7 @@ class Display(object):
     @staticmethod
     def _remove(obj):
         parts = Display.partDict[obj]
-        graphicsUtils.remove_from_screen(parts);
+        Display.graphics.remove_from_screen(parts);
         
     @staticmethod
     def redrawObservations(observations):
@@ -12,14 +12,16 @@ import random
 import string
 import time
 import types
-# import tkinter as Tkinter
-import engine.plugins.mtTkinter.mtTkinter as Tkinter
-import tkinter
 from engine.vector import Vec2d
 
 _Windows = sys.platform == 'win32'  # True if on Win95/98/NT
 
-_root_window = Tkinter.Tk()     # The root window for graphics output
+# Tk is only imported when a window is opened, so the module (and the
+# colours in Display) can be used on machines without a display.
+Tkinter = None
+tkinter = None
+
+_root_window = None     # The root window for graphics output
 _canvas = None      # The canvas which holds graphics
 _canvas_xs = None      # Size of canvas object
 _canvas_ys = None
@@ -41,6 +43,17 @@ else:
     _canvas_tfonts = ['times', 'lucidasans-24']
     pass # XXX need defaults here
 
+def _init_tk():
+    global Tkinter, tkinter, _root_window
+    if Tkinter is None:
+        # import tkinter as Tkinter
+        import engine.plugins.mtTkinter.mtTkinter as mtTkinter
+        import tkinter as rawTkinter
+        Tkinter = mtTkinter
+        tkinter = rawTkinter
+    if _root_window is None:
+        _root_window = Tkinter.Tk()
+
 def sleep(secs):
     global _root_window
     if _root_window == None:
@@ -65,6 +78,7 @@ def begin_graphics(width=640, height=480, color=formatColor(0, 0, 0), title=None
     _bg_color = color
     
     # Create the root window
+    _init_tk()
     _root_window.protocol('WM_DELETE_WINDOW', raiseEndGraphics)
     _root_window.title(title or 'Graphics Window')
     _root_window.resizable(0, 0)
@@ -156,8 +170,7 @@ def end_graphics():
       except SystemExit as e:
         print(('Ending graphics raised an exception:', e))
     finally:
-      # _root_window = None
-      _root_window = Tkinter.Tk()
+      _root_window = None
       _canvas = None
       _mouse_enabled = 0
       _clear_keys()
@@ -269,11 +282,9 @@ def changeText(id, newText, font=None, size=12, style='normal'):
 def breath():
     _root_window.tk.dooneevent(tkinter._tkinter.DONT_WAIT)
 
-def changeColor(id, newColor,
-            d_o_e=_root_window.tk.dooneevent,
-            d_w=tkinter._tkinter.DONT_WAIT):
+def changeColor(id, newColor):
   _canvas.itemconfigure(id, fill=newColor)
-  d_o_e(d_w)
+  breath()
 
 def line(here, there, color=formatColor(0, 0, 0), width=2):
   x0, y0 = here[0], here[1]
@@ -328,8 +339,7 @@ def _clear_keys(event=None):
     _keyswaiting = {}
     _got_release = None
 
-def keys_pressed(d_o_e=_root_window.tk.dooneevent,
-                 d_w=tkinter._tkinter.DONT_WAIT):
+def keys_pressed():
     #d_o_e(d_w)
     #if _got_release:
     #  d_o_e(d_w)
@@ -350,11 +360,9 @@ def wait_for_keys():
         sleep(0.05)
     return keys
 
-def remove_from_screen(x,
-                       d_o_e=_root_window.tk.dooneevent,
-                       d_w=tkinter._tkinter.DONT_WAIT):
+def remove_from_screen(x):
     _canvas.delete(x)
-    d_o_e(d_w)
+    breath()
 
 def _adjust_coords(coord_list, x, y):
     for i in range(0, len(coord_list), 2):
@@ -362,9 +370,7 @@ def _adjust_coords(coord_list, x, y):
         coord_list[i + 1] = coord_list[i + 1] + y
     return coord_list
 
-def move_to(object, x, y=None,
-            d_o_e=_root_window.tk.dooneevent,
-            d_w=tkinter._tkinter.DONT_WAIT):
+def move_to(object, x, y=None):
     if y is None:
         try: x, y = x
         except: raise  Exception('incomprehensible coordinates')
@@ -382,11 +388,9 @@ def move_to(object, x, y=None,
       newCoords.append(coord + inc)
     
     _canvas.coords(object, *newCoords)
-    d_o_e(d_w)
+    breath()
     
-def move_by(object, x, y=None,
-            d_o_e=_root_window.tk.dooneevent,
-            d_w=tkinter._tkinter.DONT_WAIT):
+def move_by(object, x, y=None):
     if y is None:
         try: x, y = x
         except: raise Exception('incomprehensible coordinates') 
@@ -402,7 +406,7 @@ def move_by(object, x, y=None,
       newCoords.append(coord + inc)
       
     _canvas.coords(object, *newCoords)
-    #d_o_e(d_w)
+    #breath()
     
 def rotate_by(obj, angle):
     vecs = vecs_from_coords(_canvas.coords(obj))
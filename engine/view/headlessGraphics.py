@@ -0,0 +1,157 @@
+'''
+Drop-in replacement for graphicsUtils that never touches Tk.
+
+Display switches to this module when Const.HEADLESS is set. Every shape is
+recorded as a kind, a fill colour and a flat coordinate list, and moves,
+rotations, colour changes and removals are applied to the record, so the
+final scene can still be inspected (getItems) without a window. sleep()
+is a plain time.sleep() and no keys are ever pressed.
+'''
+from engine.vector import Vec2d
+
+import time
+
+
+_items = {}
+_nextId = 1
+_callCounts = {}
+
+
+def _count(name):
+    _callCounts[name] = _callCounts.get(name, 0) + 1
+
+
+def _add(kind, coords, color):
+    global _nextId
+    itemId = _nextId
+    _nextId += 1
+    _items[itemId] = {'kind': kind, 'coords': coords, 'color': color}
+    return itemId
+
+
+def formatColor(r, g, b, a = 0.0):
+    return '#%02x%02x%02x' % (int(r * 255), int(g * 255), int(b * 255))
+
+
+def begin_graphics(width=640, height=480, color=formatColor(0, 0, 0), title=None):
+    _count('begin_graphics')
+    _items.clear()
+
+
+def end_graphics():
+    _count('end_graphics')
+
+
+def raiseEndGraphics():
+    _count('raiseEndGraphics')
+
+
+def sleep(secs):
+    time.sleep(secs)
+
+
+def refresh():
+    _count('refresh')
+
+
+def polygon(coords, outlineColor, fillColor=None, filled=1.0, smoothed=1, behind=0, width=1):
+    _count('polygon')
+    if fillColor == None: fillColor = outlineColor
+    if filled == 0: fillColor = ""
+    flat = []
+    for coord in coords:
+        flat.append(coord[0])
+        flat.append(coord[1])
+    return _add('polygon', flat, fillColor)
+
+
+def square(pos, size, color, filled=1, behind=0):
+    r = size / 2.0
+    x = pos.x
+    y = pos.y
+    coords = [(x - r, y - r), (x + r, y - r), (x + r, y + r), (x - r, y + r)]
+    return polygon(coords, color, color, filled, 0, behind=behind)
+
+
+def rectangle(pos, length, width, color, dir = None, filled = 1, behind=0):
+    coordVecs = [
+        Vec2d(- width/2.0, - length/2.0),
+        Vec2d(+ width/2.0, - length/2.0),
+        Vec2d(+ width/2.0, + length/2.0),
+        Vec2d(- width/2.0, + length/2.0)
+    ]
+    if dir != None:
+        dir = dir.normalized()
+        angle = -dir.get_angle_between(Vec2d(0, -1))
+    else:
+        angle = 0
+    coords = []
+    for coord in coordVecs:
+        coord.rotate(angle)
+        coord += pos
+        coords.append((coord.x, coord.y))
+    return polygon(coords, color, color, filled, 0, behind=behind)
+
+
+def circle(pos, r, outlineColor, fillColor, endpoints=None, style='pieslice', width=2):
+    _count('circle')
+    return _add('circle', [pos.x - r - 1, pos.y - r - 1, pos.x + r, pos.y + r], fillColor)
+
+
+def line(here, there, color=formatColor(0, 0, 0), width=2):
+    _count('line')
+    return _add('line', [here[0], here[1], there[0], there[1]], color)
+
+
+def text(pos, color, contents, font='Helvetica', size=12, style='normal', anchor="nw"):
+    _count('text')
+    return _add('text', [pos[0], pos[1]], color)
+
+
+def changeColor(id, newColor):
+    _count('changeColor')
+    _items[id]['color'] = newColor
+
+
+def remove_from_screen(x):
+    _count('remove_from_screen')
+    _items.pop(x, None)
+
+
+def move_by(object, x, y=None):
+    _count('move_by')
+    if y is None:
+        x, y = x
+    coords = _items[object]['coords']
+    for i in range(0, len(coords), 2):
+        coords[i] += x
+        coords[i + 1] += y
+
+
+def rotate_by(obj, angle):
+    _count('rotate_by')
+    coords = _items[obj]['coords']
+    vecs = [Vec2d(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+    anchorPos = Vec2d.getAverage(vecs)
+    for i, vec in enumerate(vecs):
+        vec -= anchorPos
+        vec.rotate(angle)
+        vec += anchorPos
+        coords[2 * i] = vec.x
+        coords[2 * i + 1] = vec.y
+
+
+def keys_pressed():
+    return []
+
+
+def keys_waiting():
+    return []
+
+
+def getItems():
+    return _items
+
+
+def getCallCounts():
+    return dict(_callCounts)
@@ -0,0 +1,47 @@
+'''
+Generates a city-grid world (see engine/graphCreater/layoutGenerator.py):
+layouts/<name>.json with a single finish, layouts/m_<name>.json with
+checkpoints, and the matching transition model learned/<name>TransProb.p.
+
+Example (a 100x100 tile world, used by drive.py -l large -m):
+    python generateLayout.py -n large -x 8 -y 8 -c 4
+'''
+from engine.const import Const
+from engine.graphCreater.layoutGenerator import LayoutGenerator, getTransProb
+from engine.model.layout import Layout
+
+import json
+import optparse
+import os
+import pickle
+
+
+if __name__ == '__main__':
+
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--name', dest='name', default='large')
+    parser.add_option('-x', '--blocksX', type='int', dest='blocksX', default=8, help='blocks from west to east')
+    parser.add_option('-y', '--blocksY', type='int', dest='blocksY', default=8, help='blocks from north to south')
+    parser.add_option('-b', '--blockSize', type='int', dest='blockSize', default=8, help='in tiles')
+    parser.add_option('-r', '--roadSize', type='int', dest='roadSize', default=4, help='in tiles')
+    parser.add_option('-c', '--checkpoints', type='int', dest='checkpoints', default=4)
+    parser.add_option('-s', '--seed', type='int', dest='seed', default=0, help='seed for placing checkpoints')
+
+    (options, _) = parser.parse_args()
+    if options.name.startswith('m_'):
+        parser.error('name must not start with m_')
+
+    generator = LayoutGenerator(options.blocksX, options.blocksY, options.blockSize, options.roadSize, options.seed)
+    # the transition model is learned on the world with the single finish
+    data = generator.getData(None)
+    for worldName, worldData in [(options.name, data), ('m_' + options.name, generator.getData(options.checkpoints))]:
+        layoutPath = os.path.join(Const.LAYOUT_DIR, worldName + '.json')
+        with open(layoutPath, 'w') as layoutFile:
+            json.dump(worldData, layoutFile)
+        print('Wrote ' + layoutPath)
+
+    layout = Layout(options.name, data)
+    transPath = os.path.join('learned', options.name + 'TransProb.p')
+    with open(transPath, 'wb') as transFile:
+        pickle.dump(getTransProb(layout), transFile)
+    print('Wrote %s (%dx%d tiles)' % (transPath, layout.getBeliefRows(), layout.getBeliefCols()))
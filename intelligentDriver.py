@@ -9,12 +9,23 @@ import heapq
 import itertools
 import random
 import math
+import time
 from turtle import Vec2D
 from engine.const import Const
 from engine.vector import Vec2d
 from engine.model.car.car import Car
 from engine.model.layout import Layout
 from engine.model.car.junior import Junior
+from engine.planner.forecast import TransitionModel, OccupancyForecaster
+from engine.planner.spaceTime import SpaceTimePlanner
+from engine.planner.anytime import AnytimePlanner
+from engine.planner.tileMap import TileMap
+from engine.planner.clearance import ClearanceMap
+from engine.planner import compiledLayout
+from engine.planner.routeLibrary import RouteLibrary
+from engine.planner.hierarchical import HierarchicalPlanner
+from engine.planner.beliefCosts import BeliefCosts
+from engine.planner.risk import CollisionRisk, straightLineTrajectory
 from configparser import InterpolationMissingOptionError
 
 # Class: Graph
@@ -39,28 +50,67 @@ class IntelligentDriver(Junior):
         self.burnInIterations = 30
         self.layout = layout
         self.costFactor = 1000
-        self.paddedBlocks = []
+        # static tables of the layout, computed once (see compiledLayout.py)
+        self.compiled = compiledLayout.load(layout) if Const.COMPILE_LAYOUTS else None
+        # obstacle / checkpoint / car-near attributes of every tile
+        self.tileMap = TileMap(layout, self.compiled)
+        # distance of every tile to the nearest block or the world border
+        self.clearanceMap = ClearanceMap(
+            self.tileMap.getMask(TileMap.OBSTACLE), self.layout.getBeliefRows(), self.layout.getBeliefCols(),
+            self.compiled)
         self.worldGraph = self.createWorldGraph()
         self.waitingSince = 0
         self.maxWait = 0
         # a list of single tile locations corresponding to each checkpoint
         self.checkPoints = self.layout.getCheckPoints()
         self.transProb = util.loadTransProb()
+        self.transModel = TransitionModel(
+            self.transProb, self.layout.getBeliefRows(), self.layout.getBeliefCols())
+        self.forecaster = OccupancyForecaster(self.transModel)
+        self.forecast = None
+        self.collisionRisk = CollisionRisk(self.transModel) if Const.RISK_VETO else None
+        self.vetoedSince = 0
+        self.lastPath = None
+        self.plannedPath = None
+        self.plannedGoal = None
+        self.plannedLikelihood = None
+        self.snapshotBeliefs = None
+        self.snapshotLikelihood = None
+        # plan requests seen by the gated planner, and how many of them replanned
+        self.numPlanRequests = 0
+        self.numReplans = 0
+        # only the planner selected by Const.PLANNER is built
+        self.spaceTimePlanner = None
+        self.anytimePlanner = None
+        self.hierarchicalPlanner = None
+        if Const.PLANNER == 'spaceTime':
+            self.spaceTimePlanner = SpaceTimePlanner(
+                self.worldGraph.nodes, self.layout.getBeliefRows(), self.layout.getBeliefCols(),
+                {tile: self.clearanceMap.getCost(tile) for tile in self.worldGraph.nodes})
+        elif Const.PLANNER == 'anytime':
+            self.anytimePlanner = AnytimePlanner(
+                self.worldGraph.nodes, self.layout.getBeliefRows(), self.layout.getBeliefCols())
+        elif Const.PLANNER == 'hierarchical':
+            compiled = compiledLayout.load(layout, 'hierarchical') if Const.COMPILE_LAYOUTS else None
+            self.hierarchicalPlanner = HierarchicalPlanner(
+                self.layout.getJuniorGraph(), self.worldGraph.nodes, self.layout.getBeliefRows(), self.layout.getBeliefCols(),
+                compiled)
+        self.routeLibrary = None
+        if Const.ROUTE_WARM_START:
+            self.routeLibrary = RouteLibrary(layout, self.worldGraph.nodes, self.clearanceMap.getCosts())
+        self.routeProgress = 0
+        self.routeLeg = -1
+        self.anytimeBeliefs = None
+        self.anytimeCosts = None
+        self.anytimeLikelihood = None
         self.carLocations = []
+        # the pose given to getNextGoalPos, see getPlanPose
+        self.planPose = None
 
     def getNodeIdentifier(self, node):
         (x, y) = node
         return self.layout.getBeliefCols()*x + y
 
-    def getContours(self, pad_block):
-        x, y = pad_block[0], pad_block[1]
-        adjNodes = [(x, y-1), (x, y+1), (x-1, y), (x+1, y)]
-        contour = []
-        for tile in adjNodes:
-            if tile not in self.worldGraph.nodes:
-                contour.append(tile)
-        return contour
-
     # ONE POSSIBLE WAY OF REPRESENTING THE GRID WORLD. FEEL FREE TO CREATE YOUR OWN REPRESENTATION.
     # Function: Create World Graph
     # ---------------------
@@ -69,66 +119,42 @@ class IntelligentDriver(Junior):
         nodes = []
         edges = []
         # create self.worldGraph using self.layout
-        numRows, numCols = self.layout.getBeliefRows(), self.layout.getBeliefCols()
 
         # NODES #
-        # each tile represents a node
-        nodes = [(x, y) for x, y in itertools.product(
-            range(numRows), range(numCols))]
+        # each tile that is not covered by a block (or obstacle) represents a node
+        nodes = self.tileMap.getFreeTiles()
 
         # EDGES #
-        # Adjacency Matrix #
-        edges = [[0 for _ in range(len(nodes))] for _ in range(len(nodes))]
+        # Adjacency lists: edges[nodeId] maps each neighbouring nodeId to the
+        # cost of moving there, so edges[a][b] reads like an adjacency matrix
+        # without allocating one.
+        edges = {}
 
-        # EDGES #
         # We create an edge between adjacent nodes (nodes at a distance of 1 tile)
         # avoid the tiles representing walls or blocks
         # YOU MAY WANT DIFFERENT NODE CONNECTIONS FOR YOUR OWN IMPLEMENTATION,
         # FEEL FREE TO MODIFY THE EDGES ACCORDINGLY.
-
-        # Get the tiles corresponding to the blocks (or obstacles):
-        blocks = self.layout.getBlockData()
-        blockTiles = []
-        for block in blocks:
-            row1, col1, row2, col2 = block[1], block[0], block[3], block[2]
-            # some padding to ensure the AutoCar doesn't crash into the blocks due to its size. (optional)
-            blockWidth = col2-col1
-            blockHeight = row2-row1
-            for i in range(blockHeight):
-                for j in range(blockWidth):
-                    blockTile = (row1+i, col1+j)
-                    blockTiles.append(blockTile)
-            Erow1, Ecol1, Erow2, Ecol2 = row1-1, col1-1, row2+1, col2+1
-            for r in range(row1, row2):
-                self.paddedBlocks.append((r, Ecol1))
-                self.paddedBlocks.append((r, Ecol2-1))
-            for c in range(col1, col2):
-                self.paddedBlocks.append((Erow1, c))
-                self.paddedBlocks.append((Erow2-1, c))
-
-        for r in range(0, self.layout.getBeliefRows()):
-            self.paddedBlocks.append((r, 0))
-            self.paddedBlocks.append((r, self.layout.getBeliefCols()-1))
-        for c in range(0, self.layout.getBeliefCols()):
-            self.paddedBlocks.append((0, c))
-            self.paddedBlocks.append((self.layout.getBeliefRows()-1, c))
-
-        # Remove blockTiles from 'nodes'
-        nodes = [x for x in nodes if x not in blockTiles]
+        # Tiles close to the blocks and the border cost more (see ClearanceMap)
+        # to ensure the AutoCar doesn't crash into the blocks due to its size.
+        if self.compiled is not None:
+            # the same neighbours, precomputed in the compiled layout
+            offsets = self.compiled.getArray('neighbourOffsets')
+            targets = self.compiled.getArray('neighbourTargets')
+            costs = self.clearanceMap.getCosts()
+            for node in nodes:
+                nodeId = self.getNodeIdentifier(node)
+                edges[nodeId] = {ngbrId: 1 + costs[ngbrId] for ngbrId in targets[offsets[nodeId]:offsets[nodeId + 1]]}
+            return Graph(nodes, edges)
 
         for node in nodes:
             x, y = node[0], node[1]
             adjNodes = [(x, y-1), (x, y+1), (x-1, y), (x+1, y)]
+            nodeEdges = {}
             # only keep allowed (within boundary) adjacent nodes
             for tile in adjNodes:
-                if tile[0] >= 0 and tile[1] >= 0 and tile[0] < numRows and tile[1] < numCols:
-                    if tile not in blockTiles:
-                        if tile in self.paddedBlocks:
-                            edges[self.getNodeIdentifier(node)][self.getNodeIdentifier(
-                                tile)] = self.costFactor/1000
-                        else:
-                            edges[self.getNodeIdentifier(
-                                node)][self.getNodeIdentifier(tile)] = 1
+                if self.tileMap.isFree(tile):
+                    nodeEdges[self.getNodeIdentifier(tile)] = 1 + self.clearanceMap.getCost(tile)
+            edges[self.getNodeIdentifier(node)] = nodeEdges
 
         return Graph(nodes, edges)
 
@@ -164,158 +190,293 @@ class IntelligentDriver(Junior):
             for col in range(len(carsLikelihood[row])):
                 carsLikelihood[row][col] /= total
 
-        for node in self.worldGraph.nodes:
-            (x, y) = node
-            adjNodes = [(x, y-1), (x, y+1), (x-1, y), (x+1, y)]
-            for (row, col) in adjNodes:
-                if (row, col) in checkPoint:
-                    self.worldGraph.edges[self.getNodeIdentifier(node)][self.getNodeIdentifier((row, col))] = 1 + 10*self.costFactor*(carsLikelihood[row][col] + carsLikelihood[node[0]][node[1]])/2
-                if row >= 0 and col >= 0 and row < self.layout.getBeliefRows() and col < self.layout.getBeliefCols():
-                    self.worldGraph.edges[self.getNodeIdentifier(node)][self.getNodeIdentifier((row, col))] = 1 + self.costFactor*carsLikelihood[row][col]
+        numCols = self.layout.getBeliefCols()
+        clearanceCosts = self.clearanceMap.getCosts()
+        for nodeId, nodeEdges in self.worldGraph.edges.items():
+            for ngbrId in nodeEdges:
+                (row, col) = divmod(ngbrId, numCols)
+                nodeEdges[ngbrId] = 1 + clearanceCosts[ngbrId] + self.costFactor*carsLikelihood[row][col]
         return carsLikelihood
 
     def getShortestPathUsingDijkstra(self, start: tuple, end: tuple, beliefOfOtherCars: list, parkedCars: list):
-        # initialize
         likelihood = self.modifyWorldGraph(beliefOfOtherCars, end, parkedCars)
-        visited = {}
-        distance = {}
-        prev = {}
-        for node in self.worldGraph.nodes:
-            distance[node] = float('inf')
-            prev[node] = None
-            visited[node] = False
-        distance[start] = 0
+        return self.searchWorldGraph(start, end, likelihood)
+
+    # Function: Search World Graph
+    # ---------------------
+    # Dijkstra from start to end on the current edge costs of the world graph.
+    # Returns the first tile of the path, whether to move now and the offset.
+    # With tileCosts (a BeliefCosts), the belief costs of the tiles reached
+    # come from it instead, and likelihood is not used.
+    def searchWorldGraph(self, start: tuple, end: tuple, likelihood: list, tileCosts=None):
+        # initialize
+        numCols = self.layout.getBeliefCols()
+        clearanceCosts = self.clearanceMap.getCosts()
+        visited = set()
+        distance = {start: 0}
+        prev = {start: None}
         pathFound = False
         priorityQueue = [(0, start)]
 
         # main loop
-        while (False in visited.values()):
+        while priorityQueue:
             minDistance, minNode = heapq.heappop(priorityQueue)
-            for node in self.worldGraph.nodes:
-                if not visited[node] and distance[node] < minDistance:
-                    minDistance = distance[node]
-                    minNode = node
-            visited[minNode] = True
+            if minNode in visited:
+                continue
+            visited.add(minNode)
             if minNode == end:
                 pathFound = True
                 break
 
             # update distance
-            for ngbr in self.worldGraph.nodes:
-                edgeCost = self.worldGraph.edges[self.getNodeIdentifier(
-                    minNode)][self.getNodeIdentifier(ngbr)]
-                if edgeCost > 0 and not visited[ngbr]:
-                    if minDistance + edgeCost < distance[ngbr]:
+            nodeEdges = self.worldGraph.edges.get(self.getNodeIdentifier(minNode), {})
+            for ngbrId, edgeCost in nodeEdges.items():
+                if tileCosts is not None:
+                    edgeCost = 1 + clearanceCosts[ngbrId] + tileCosts[ngbrId]
+                ngbr = divmod(ngbrId, numCols)
+                if ngbr not in visited:
+                    if minDistance + edgeCost < distance.get(ngbr, float('inf')):
                         distance[ngbr] = minDistance + edgeCost
                         heapq.heappush(priorityQueue, (distance[ngbr], ngbr))
                         prev[ngbr] = minNode
 
         # find the path
         if (pathFound):
-            node = end
-            while prev[node] != start:
-                node = prev[node]
-            x_offset = 0
-            y_offset = 0
-
-            temp_vectorToGoal = (util.colToX(
-                node[1]), util.rowToY(node[0])) - self.pos
-            temp_wheelAngle = -temp_vectorToGoal.get_angle_between(self.dir)
-
-            if node in self.paddedBlocks:
-                blockedAreas = self.getContours(node)
-                for block in blockedAreas:
-                    if abs(temp_wheelAngle) > 10 and (node[0] == block[0]):
-                        x_offset = (node[1] - block[1])*Car.LENGTH*0.5
-                    elif abs(temp_wheelAngle) > 10 and (node[1] == block[1]):
-                        y_offset = (node[0] - block[0])*Car.LENGTH*0.5
-
-            self.maxWait = 0
-            carParked = False
-            for (r_Car, c_Car) in self.carLocations:
-                for i in range(-1, 2, 1):
-                    for j in range(-1, 2, 1):
-                        if (r_Car + i, c_Car + j) == node:
-                            carParked = True
-                            self.maxWait = likelihood[node[0]][node[1]]*100
-                            break
-                    if carParked:
-                        break
-                if carParked:
-                    break
-            
-            if not carParked:
-                if likelihood[node[0]][node[1]] > 0.3:
-                    self.maxWait = float('inf')
-                else:
-                    self.maxWait = likelihood[node[0]][node[1]]*500
+            self.lastPath = [end]
+            while self.lastPath[-1] != start:
+                self.lastPath.append(prev[self.lastPath[-1]])
+            self.lastPath.reverse()
+            node = self.lastPath[1] if len(self.lastPath) > 1 else start
+            (x_offset, y_offset), temp_wheelAngle = self.getTurnOffset(node)
+            if tileCosts is not None:
+                nodeLikelihood = tileCosts.getLikelihood(self.getNodeIdentifier(node))
             else:
-                self.maxWait = likelihood[node[0]][node[1]]*300
-
-            if abs(temp_wheelAngle) > 10 and (start in self.checkPoints or start in self.paddedBlocks or node in self.checkPoints or node in self.paddedBlocks):
-                self.maxWait = max(self.maxWait, 5)
+                nodeLikelihood = likelihood[node[0]][node[1]]
+            self.updateMaxWait(start, node, nodeLikelihood, temp_wheelAngle)
 
             if self.maxWait > 0:
                 return node, False, (x_offset, y_offset)
             return node, True, (x_offset, y_offset)
         else:
-            return start, False, (x_offset, y_offset)
+            self.lastPath = None
+            return start, False, (0, 0)
+
+    # Function: Get Next Tile Using Gated Dijkstra
+    # ---------------------
+    # Dijkstra that only replans when it has to: the previous path is reused
+    # while the AutoCar is still on it and the edge costs in the corridor
+    # around the rest of the path changed by at most Const.REPLAN_TOLERANCE
+    # since the path was planned. The likelihood of the latest belief snapshot
+    # is kept (the world graph already has its edge costs), so the heartbeats
+    # between two estimator ticks neither rebuild it nor compare it again.
+    def getNextTileUsingGatedDijkstra(self, start: tuple, end: tuple, snapshot: list, beliefOfOtherCars: list, parkedCars: list):
+        self.numPlanRequests += 1
+        path = self.plannedPath
+        i = path.index(start) if path is not None and self.plannedGoal == end and start in path else None
+        if snapshot is self.snapshotBeliefs:
+            likelihood = self.snapshotLikelihood
+        else:
+            likelihood = self.modifyWorldGraph(beliefOfOtherCars, end, parkedCars)
+            self.snapshotBeliefs = snapshot
+            self.snapshotLikelihood = likelihood
+            if i is not None and self.getCorridorChange(path[i:], likelihood) > Const.REPLAN_TOLERANCE:
+                i = None
+
+        if i is None:
+            self.numReplans += 1
+            result = self.searchWorldGraph(start, end, likelihood)
+            self.plannedPath = self.lastPath
+            self.plannedGoal = end
+            self.plannedLikelihood = likelihood
+        else:
+            node = path[i+1] if i + 1 < len(path) else start
+            offset, wheelAngle = self.getTurnOffset(node)
+            self.updateMaxWait(start, node, likelihood[node[0]][node[1]], wheelAngle)
+            result = node, self.maxWait <= 0, offset
+        return result
+
+    def getNumReplansSkipped(self):
+        return self.numPlanRequests - self.numReplans
+
+    # Largest change in edge cost, relative to the costs the current path was
+    # planned with, over the given path tiles and their neighbours.
+    def getCorridorChange(self, pathTiles: list, likelihood: list):
+        old = self.plannedLikelihood
+        change = 0
+        for (row, col) in pathTiles:
+            for (r, c) in [(row, col), (row, col-1), (row, col+1), (row-1, col), (row+1, col)]:
+                if self.tileMap.isFree((r, c)):
+                    change = max(change, abs(likelihood[r][c] - old[r][c]))
+        return self.costFactor*change
+
+    # Function: Get Next Tile Using Hierarchical
+    # ---------------------
+    # The road graph, weighted with the likelihood of other cars along each
+    # road, picks the next waypoint; Dijkstra on the tile grid only plans the
+    # segment from the AutoCar to that waypoint. The belief costs are only
+    # computed for the tiles the two searches reach (see BeliefCosts).
+    def getNextTileUsingHierarchical(self, start: tuple, end: tuple, beliefOfOtherCars: list, parkedCars: list):
+        tileCosts = BeliefCosts(beliefOfOtherCars, parkedCars, self.layout.getBeliefRows(),
+                                self.layout.getBeliefCols(), self.costFactor)
+        waypoint = self.hierarchicalPlanner.getWaypoint(start, end, tileCosts)
+        return self.searchWorldGraph(start, waypoint, None, tileCosts)
+
+    # Function: Get Next Tile Using Route
+    # ---------------------
+    # Follows the precomputed static route of the current leg while the next
+    # Const.ROUTE_LOOKAHEAD tiles are unlikely to be occupied. Otherwise (or
+    # after leaving the route) Dijkstra only plans a detour back onto the
+    # route, to the end of the stretch where other cars are likely to be.
+    def getNextTileUsingRoute(self, start: tuple, end: tuple, chkPtsSoFar: int, beliefOfOtherCars: list, parkedCars: list):
+        likelihood = self.modifyWorldGraph(beliefOfOtherCars, end, parkedCars)
+        route = self.routeLibrary.getRoute(chkPtsSoFar)
+        if chkPtsSoFar != self.routeLeg:
+            self.routeLeg = chkPtsSoFar
+            self.routeProgress = 0
+        i = route.getIndex(start)
+        if i is not None:
+            self.routeProgress = max(self.routeProgress, i)
+            window = route.getPath()[i+1:i+1+Const.ROUTE_LOOKAHEAD]
+            if all(likelihood[r][c] < Const.ROUTE_DEVIATION_PROB for (r, c) in window):
+                node = route.getTile(i+1)
+                offset, wheelAngle = self.getTurnOffset(node)
+                self.updateMaxWait(start, node, likelihood[node[0]][node[1]], wheelAngle)
+                return node, self.maxWait <= 0, offset
+        # rejoin the route after the first Const.ROUTE_LOOKAHEAD clear tiles
+        # past the congested stretch
+        path = route.getPath()
+        k = self.routeProgress + 1
+        clearTiles = 0
+        while k < len(path) - 1 and clearTiles < Const.ROUTE_LOOKAHEAD:
+            (r, c) = path[k]
+            clearTiles = clearTiles + 1 if likelihood[r][c] < Const.ROUTE_DEVIATION_PROB else 0
+            k += 1
+        return self.searchWorldGraph(start, route.getTile(k), likelihood)
+
+    # Function: Update Max Wait
+    # ---------------------
+    # Decides how many heartbeats the AutoCar should wait before entering
+    # node, based on the likelihood of other cars around it.
+    # nodeLikelihood is the likelihood of other cars in node.
+    def updateMaxWait(self, start, node, nodeLikelihood, wheelAngle):
+        # is node next to (within one tile of) a parked car?
+        carParked = self.tileMap.isCarNear(node)
+        if not carParked:
+            if nodeLikelihood > 0.3:
+                self.maxWait = float('inf')
+            else:
+                self.maxWait = nodeLikelihood*500
+        else:
+            self.maxWait = nodeLikelihood*300
+
+        if self.needsTurnPause(start, node, wheelAngle):
+            self.maxWait = max(self.maxWait, 5)
 
+    # Function: Get Turn Offset
+    # ---------------------
+    # When turning into a tile next to a wall, aim half a car length away
+    # from the wall, along the clearance gradient. Returns the offset and the
+    # wheel angle needed to reach the centre of the tile.
+    def getTurnOffset(self, node):
+        x_offset = 0
+        y_offset = 0
+
+        planPos, planDir, _ = self.getPlanPose()
+        temp_vectorToGoal = (util.colToX(
+            node[1]), util.rowToY(node[0])) - planPos
+        temp_wheelAngle = -temp_vectorToGoal.get_angle_between(planDir)
+
+        if abs(temp_wheelAngle) > 10 and self.clearanceMap.isNearWall(node):
+            dRow, dCol = self.clearanceMap.getGradient(node)
+            norm = math.hypot(dRow, dCol)
+            if norm > Const.EPSILON:
+                x_offset = dCol/norm*Car.LENGTH*0.5
+                y_offset = dRow/norm*Car.LENGTH*0.5
+        return (x_offset, y_offset), temp_wheelAngle
+
+    # Function: Needs Turn Pause
+    # ---------------------
+    # Sharp turns close to walls or checkpoints are taken from a standstill.
+    def needsTurnPause(self, start, node, wheelAngle):
+        tileMap = self.tileMap
+        clearanceMap = self.clearanceMap
+        return abs(wheelAngle) > 10 and (tileMap.isCheckPoint(start) or clearanceMap.isNearWall(start) or tileMap.isCheckPoint(node) or clearanceMap.isNearWall(node))
+
+    # Function: Get Next Tile Using Space Time
+    # ---------------------
+    # Plans over (tile, t) states using the occupancy forecast of the current
+    # estimator tick. Waiting is an explicit action of the plan, so the
+    # AutoCar only stops when the search decides that waiting is cheaper.
+    def getNextTileUsingSpaceTime(self, start: tuple, end: tuple):
+        plan = self.spaceTimePlanner.plan(
+            start, end, self.forecast, Const.SPACE_TIME_OCCUPANCY_WEIGHT)
+        node = plan.getNextTile()
+        offset, wheelAngle = self.getTurnOffset(node)
+        self.maxWait = 0
+        if plan.waitsFirst() and start != end:
+            self.maxWait = Const.SPACE_TIME_MAX_WAIT
+        elif self.needsTurnPause(start, node, wheelAngle):
+            self.maxWait = 5
+        return node, self.maxWait == 0, offset
+
+    # Function: Get Next Tile Using Anytime
+    # ---------------------
+    # ARA* with a hard deadline of a fraction of one UI heartbeat. The cost
+    # field is rebuilt only when a new belief snapshot arrives, so until then
+    # the planner keeps refining the same search across heartbeats.
+    def getNextTileUsingAnytime(self, start: tuple, end: tuple, snapshot: list, beliefOfOtherCars: list, parkedCars: list):
+        deadline = time.time() + Const.SECONDS_PER_UI_HEARTBEAT * Const.ANYTIME_TIME_FRACTION
+        if Const.TURBO:
+            # wall-clock budgets would make turbo runs irreproducible
+            deadline = float('inf')
+        if snapshot is not self.anytimeBeliefs:
+            likelihood = self.modifyWorldGraph(beliefOfOtherCars, end, parkedCars)
+            clearanceCosts = self.clearanceMap.getCosts()
+            self.anytimeCosts = [1 + clearanceCosts[i] + self.costFactor*p
+                                 for i, p in enumerate(p for row in likelihood for p in row)]
+            self.anytimeLikelihood = likelihood
+            self.anytimeBeliefs = snapshot
+        node = self.anytimePlanner.step(start, end, self.anytimeCosts, deadline)
+        offset, wheelAngle = self.getTurnOffset(node)
+        self.updateMaxWait(start, node, self.anytimeLikelihood[node[0]][node[1]], wheelAngle)
+        return node, self.maxWait <= 0, offset
+
+    # Function: Is Move Safe
+    # ---------------------
+    # Monte Carlo check of driving straight towards goalPos for the next
+    # Const.RISK_STEPS estimator ticks. Risky moves are vetoed for at most
+    # Const.RISK_MAX_WAIT heartbeats in a row.
+    def isMoveSafe(self, goalPos, snapshot: list, parkedCars: list):
+        self.collisionRisk.setBeliefs(snapshot, parkedCars)
+        planPos, _, planVelocity = self.getPlanPose()
+        speed = min(Junior.MAX_SPEED, planVelocity.get_length() + Junior.ACCELERATION)
+        trajectory = straightLineTrajectory(planPos, goalPos, speed, Const.RISK_STEPS)
+        if self.collisionRisk.evaluate(trajectory) <= Const.RISK_THRESHOLD or self.vetoedSince >= Const.RISK_MAX_WAIT:
+            self.vetoedSince = 0
+            return True
+        self.vetoedSince += 1
+        return False
+
+    # Function: Update Belief Of Other Cars
+    # ---------------------
+    # Returns the beliefs the planner should use: moving cars are blended with
+    # their one-step forecast, parked cars are localised to their most likely
+    # tile. The shared belief snapshot is never modified.
     def updateBeliefOfOtherCars(self, beliefOfOtherCars: list, parkedCars: list):
+        self.forecast = self.forecaster.forecast(beliefOfOtherCars, parkedCars)
+        rows = self.layout.getBeliefRows()
+        cols = self.layout.getBeliefCols()
+        plannedBeliefs = []
         for carId in range(len(beliefOfOtherCars)):
             belief = beliefOfOtherCars[carId]
             if not parkedCars[carId]:
-                newBelief = [[0 for col in range(self.layout.getBeliefCols())] for row in range(
-                    self.layout.getBeliefRows())]
-                rows = belief.numRows
-                cols = belief.numCols
-                init_weights = [belief.grid[i][j]
-                                for i in range(rows) for j in range(cols)]
-                init_particles = [
-                    i*cols + j for i in range(rows) for j in range(cols)]
-                particles = random.choices(
-                    init_particles, init_weights, k=len(init_particles))
-                i = 0
-                while (i < len(particles)):
-                    particle = particles[i]
-                    y = particle // cols
-                    x = particle % cols
-                    moving_prob = [self.transProb[((y, x), (y-1, x-1))] if ((y, x), (y-1, x-1)) in self.transProb else 0,
-                                   self.transProb[(
-                                       (y, x), (y, x-1))] if ((y, x), (y, x-1)) in self.transProb else 0,
-                                   self.transProb[(
-                                       (y, x), (y+1, x-1))] if ((y, x), (y+1, x-1)) in self.transProb else 0,
-                                   self.transProb[(
-                                       (y, x), (y-1, x))] if ((y, x), (y-1, x)) in self.transProb else 0,
-                                   self.transProb[((y, x), (y, x))] if (
-                        (y, x), (y, x)) in self.transProb else 0,
-                        self.transProb[(
-                                       (y, x), (y+1, x))] if ((y, x), (y+1, x)) in self.transProb else 0,
-                        self.transProb[(
-                                       (y, x), (y-1, x+1))] if ((y, x), (y-1, x+1)) in self.transProb else 0,
-                        self.transProb[(
-                                       (y, x), (y, x+1))] if ((y, x), (y, x+1)) in self.transProb else 0,
-                        self.transProb[((y, x), (y+1, x+1))] if ((y, x), (y+1, x+1)) in self.transProb else 0]
-
-                    total = sum(moving_prob)
-                    if total == 0:
-                        particles.remove(particle)
-                    else:
-                        moving_prob = [prob/total for prob in moving_prob]
-                        particles[i] = random.choices([x-1+(y-1)*cols, x-1+y*cols, x-1+(y+1)*cols, x+(
-                            y-1)*cols, x+y*cols, x+(y+1)*cols, x+1+(y-1)*cols, x+1+y*cols, x+1+(y+1)*cols], moving_prob, k=1)[0]
-                        i += 1
-                newTotal = 0
-                for particle in particles:
-                    r = particle // cols
-                    c = particle % cols
-                    newBelief[r][c] += 1
-                    newTotal += 1
-                for particle in particles:
-                    r = particle // cols
-                    c = particle % cols
-                    belief.addProb(r, c, newBelief[r][c]/newTotal)
-                belief.normalize()
+                nextGrid = self.forecast.getCarGrid(carId, 1)
+                newBelief = util.Belief(rows, cols, 0.0)
+                for r in range(rows):
+                    for c in range(cols):
+                        newBelief.setProb(r, c, belief.grid[r][c] + nextGrid[r*cols + c])
+                newBelief.normalize()
+                plannedBeliefs.append(newBelief)
             else:
                 max_row = -1
                 max_col = -1
@@ -327,6 +488,31 @@ class IntelligentDriver(Junior):
                             max_col = col
                             max_belief = belief.grid[row][col]
                 self.carLocations[carId] = (max_row, max_col)
+                plannedBeliefs.append(belief)
+        self.tileMap.setCarsNear([loc for loc in self.carLocations if self.tileMap.inGrid(loc)])
+        return plannedBeliefs
+
+    # Function: Get Forecast
+    # ---------------------
+    # The occupancy forecast (horizons 0..Const.FORECAST_HORIZON) computed for
+    # the current estimator tick, or None before the first plan.
+    def getForecast(self):
+        return self.forecast
+
+    # Function: Get Pose
+    # ---------------------
+    # A copy of the AutoCar's position, direction and velocity. The car
+    # updates these vectors in place, so a planner on another thread is
+    # given a copy taken on the UI thread instead of reading them.
+    def getPose(self):
+        return (Vec2d(self.pos.x, self.pos.y), Vec2d(self.dir.x, self.dir.y),
+                Vec2d(self.velocity.x, self.velocity.y))
+
+    # The pose the planners plan from: the one given to getNextGoalPos, or
+    # the AutoCar's own.
+    def getPlanPose(self):
+        if self.planPose is not None: return self.planPose
+        return (self.pos, self.dir, self.velocity)
 
     #######################################################################################
     # Function: Get Next Goal Position
@@ -334,13 +520,14 @@ class IntelligentDriver(Junior):
     # Given the current belief about where other cars are and a graph of how
     # one can driver around the world, chose the next position.
     #######################################################################################
-    def getNextGoalPos(self, beliefOfOtherCars: list, parkedCars: list, chkPtsSoFar: int):
+    def getNextGoalPos(self, beliefOfOtherCars: list, parkedCars: list, chkPtsSoFar: int, pose=None):
         '''
         Input:
         - beliefOfOtherCars: list of beliefs corresponding to all cars
         - parkedCars: list of booleans representing which cars are parked
         - chkPtsSoFar: the number of checkpoints that have been visited so far 
                        Note that chkPtsSoFar will only be updated when the checkpoints are updated in sequential order!
+        - pose: (pos, dir, velocity) to plan from, see getPose. Defaults to the AutoCar's own.
 
         Output:
         - goalPos: The position of the next tile on the path to the next goal location.
@@ -350,15 +537,33 @@ class IntelligentDriver(Junior):
         - You can explore some files "layout.py", "model.py", "controller.py", etc.
          to find some methods that might help in your implementation. 
         '''
-        (curr_x, curr_y) = self.getPos()  # the current 2D location of the AutoCar (refer util.py to convert it to tile (or grid cell) coordinate)
+        self.planPose = pose
+        (curr_x, curr_y) = self.getPlanPose()[0]  # the current 2D location of the AutoCar (refer util.py to convert it to tile (or grid cell) coordinate)
         curr_row = util.yToRow(curr_y)
         curr_col = util.xToCol(curr_x)
         (goal_Row, goal_Col) = self.checkPoints[chkPtsSoFar]
         for _ in range(len(beliefOfOtherCars)):
             self.carLocations.append((-2, -2))
-        self.updateBeliefOfOtherCars(beliefOfOtherCars, parkedCars)
-        (next_row, next_col), moveForward, offset = self.getShortestPathUsingDijkstra(
-            (curr_row, curr_col), (goal_Row, goal_Col), beliefOfOtherCars, parkedCars)
+        snapshot = beliefOfOtherCars
+        beliefOfOtherCars = self.updateBeliefOfOtherCars(beliefOfOtherCars, parkedCars)
+        if Const.PLANNER == 'spaceTime':
+            (next_row, next_col), moveForward, offset = self.getNextTileUsingSpaceTime(
+                (curr_row, curr_col), (goal_Row, goal_Col))
+        elif Const.PLANNER == 'anytime':
+            (next_row, next_col), moveForward, offset = self.getNextTileUsingAnytime(
+                (curr_row, curr_col), (goal_Row, goal_Col), snapshot, beliefOfOtherCars, parkedCars)
+        elif Const.PLANNER == 'hierarchical':
+            (next_row, next_col), moveForward, offset = self.getNextTileUsingHierarchical(
+                (curr_row, curr_col), (goal_Row, goal_Col), beliefOfOtherCars, parkedCars)
+        elif self.routeLibrary is not None:
+            (next_row, next_col), moveForward, offset = self.getNextTileUsingRoute(
+                (curr_row, curr_col), (goal_Row, goal_Col), chkPtsSoFar, beliefOfOtherCars, parkedCars)
+        elif Const.REPLAN_GATING:
+            (next_row, next_col), moveForward, offset = self.getNextTileUsingGatedDijkstra(
+                (curr_row, curr_col), (goal_Row, goal_Col), snapshot, beliefOfOtherCars, parkedCars)
+        else:
+            (next_row, next_col), moveForward, offset = self.getShortestPathUsingDijkstra(
+                (curr_row, curr_col), (goal_Row, goal_Col), beliefOfOtherCars, parkedCars)
 
         goalPos = (util.colToX(next_col) +
                    offset[0], util.rowToY(next_row) + offset[1])  # next tile
@@ -375,8 +580,26 @@ class IntelligentDriver(Junior):
         self.carLocations.clear()
 
         # END_YOUR_CODE
+        if moveForward and self.collisionRisk is not None:
+            moveForward = self.isMoveSafe(goalPos, snapshot, parkedCars)
         return goalPos, moveForward
 
+    # Function: Follow Plan
+    # --------------------------------
+    # Control side of the asynchronous planner (see engine/planner/worker.py):
+    # called every UI heartbeat with the newest published plan, or None if
+    # there is no fresh one, in which case the AutoCar coasts to a stop.
+    def followPlan(self, plan):
+        if self.burnInIterations > 0:
+            self.burnInIterations -= 1
+            return
+        if plan is None: return
+        vectorToGoal = plan.goalPos - self.pos
+        wheelAngle = -vectorToGoal.get_angle_between(self.dir)
+        if plan.moveForward:
+            self.accelerate(Junior.ACCELERATION)
+        self.setWheelAngle(wheelAngle)
+
     # DO NOT MODIFY THIS METHOD !
     # Function: Get Autonomous Actions
     # --------------------------------
@@ -0,0 +1,150 @@
+'''
+Replays a recorded episode (see drive.py --record and engine/trace.py)
+through an estimator and, optionally, the intelligent driver's planner,
+with no physics and no display.
+
+Every tick, each StdCar's estimator is fed the recorded AutoCar position,
+sonar reading and parked flag. Its belief is scored against the car's
+recorded position at the next tick, which is where the live simulator
+scores it. With -t the planner is then asked for the next goal from the
+recorded AutoCar pose. The run reports the mean belief error and
+latency percentiles, so two estimators or planners can be compared on
+identical inputs.
+
+Example:
+    python drive.py -a -j -m -l lombard -k 3 -n -u --record lombard.trace
+    python replay.py lombard.trace -t hierarchical
+'''
+from engine.beliefError import BeliefError
+from engine.const import Const
+from engine.containers.counter import Counter
+from engine.containers.streamingStats import StreamingStats
+from engine.model.layout import Layout
+from engine.trace import readTrace
+from engine.vector import Vec2d
+
+import copy
+import importlib
+import json
+import optparse
+import random
+import time
+import util
+
+
+# Function: Load Inference
+# ---------------------
+# 'estimator', 'none', or the dotted path of any class with the Estimator
+# (estimate) or NoInference (observe, elapseTime) interface.
+def loadInference(name, numRows, numCols):
+    if name == 'estimator':
+        name = 'estimator.Estimator'
+    elif name == 'none':
+        name = 'none.NoInference'
+    moduleName, className = name.rsplit('.', 1)
+    return getattr(importlib.import_module(moduleName), className)(numRows, numCols)
+
+
+def replay(trace, inferenceName, planner=None):
+    header = trace.getHeader()
+    Const.WORLD = header['layout']
+    Const.MULTIPLE_GOALS = Const.WORLD.startswith('m_')
+    Const.SONAR_STD = header['sonarStd']
+    if header['seed'] is not None: random.seed(header['seed'])
+    layout = Layout(Const.WORLD)
+    numRows = layout.getBeliefRows()
+    numCols = layout.getBeliefCols()
+    numCars = trace.getNumCars()
+    numTicks = trace.getNumTicks()
+    inferences = [loadInference(inferenceName, numRows, numCols) for _ in range(numCars)]
+    beliefError = BeliefError(numRows, numCols)
+
+    driver = None
+    if planner is not None:
+        from intelligentDriver import IntelligentDriver
+        Const.PLANNER = planner
+        Const.INTELLIGENT_DRIVER = True
+        Const.AUTO = True
+        driver = IntelligentDriver(layout)
+        driver.setup(Vec2d(layout.getStartX(), layout.getStartY()), layout.getJuniorDir(), Vec2d(0, 0))
+
+    estimateStats = StreamingStats()
+    planStats = StreamingStats()
+    errorCounter = Counter()
+    numStops = 0
+    start = time.time()
+    for tick in range(numTicks):
+        juniorX, juniorY, juniorDirX, juniorDirY = trace.getJunior(tick)
+        parked = [trace.isParked(tick, i) for i in range(numCars)]
+
+        estimateStart = time.time()
+        for i, inference in enumerate(inferences):
+            if hasattr(inference, 'estimate'):
+                inference.estimate(juniorX, juniorY, trace.getSonar(tick, i), parked[i])
+            else:
+                if not parked[i]: inference.elapseTime()
+                inference.observe(juniorX, juniorY, trace.getSonar(tick, i))
+        estimateStats.addValue(time.time() - estimateStart)
+
+        if tick + 1 < numTicks:
+            cars = [trace.getCar(tick + 1, i) for i in range(numCars)]
+            errors = beliefError.getErrors([inference.getBelief() for inference in inferences],
+                                           [(util.yToRow(y), util.xToCol(x)) for x, y, _, _ in cars])
+            if errors: errorCounter.addValue(sum(errors) / len(errors))
+
+        if driver is not None:
+            driver.pos = Vec2d(juniorX, juniorY)
+            driver.dir = Vec2d(juniorDirX, juniorDirY)
+            # the pose was set without update(), so drop cached geometry
+            driver.version += 1
+            snapshot = copy.deepcopy([inference.getBelief() for inference in inferences])
+            planStart = time.time()
+            _, moveForward = driver.getNextGoalPos(snapshot, parked, trace.getCheckPoints(tick))
+            planStats.addValue(time.time() - planStart)
+            if not moveForward: numStops += 1
+
+    result = {
+        'ticks': numTicks,
+        'wallTime': time.time() - start,
+        'meanError': errorCounter.getMean() if errorCounter.count else None,
+        'estimateMean': estimateStats.getMean(),
+        'estimateP50': estimateStats.getPercentile(50),
+        'estimateP95': estimateStats.getPercentile(95),
+        'estimateP99': estimateStats.getPercentile(99),
+    }
+    if driver is not None:
+        result.update({
+            'planMean': planStats.getMean(),
+            'planP50': planStats.getPercentile(50),
+            'planP95': planStats.getPercentile(95),
+            'planP99': planStats.getPercentile(99),
+            'stops': numStops,
+        })
+    return result
+
+
+if __name__ == '__main__':
+
+    parser = optparse.OptionParser(usage='%prog [options] TRACE_FILE')
+    parser.add_option('-i', '--inference', dest='inference', default=None,
+                      help='estimator, none or module.Class (default: the recorded one)')
+    parser.add_option('-t', '--planner', dest='planner', default=None)
+    parser.add_option('-o', '--output', dest='output', default=None, help='write the result as JSON')
+
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.error('expected one trace file')
+    if options.planner is not None and options.planner not in Const.PLANNER_TYPES:
+        parser.error('planner must be one of ' + ', '.join(Const.PLANNER_TYPES))
+
+    trace = readTrace(args[0])
+    inference = options.inference or trace.getHeader()['inference']
+    result = replay(trace, inference, options.planner)
+    for key, value in result.items():
+        if isinstance(value, float) and key != 'meanError' and key != 'wallTime':
+            print('%-14s %.3f ms' % (key, 1000 * value))
+        else:
+            print('%-14s %s' % (key, value))
+    if options.output:
+        with open(options.output, 'w') as outputFile:
+            json.dump(result, outputFile, indent=2)